@@ -5,24 +5,38 @@ Configurado para Render.com com PostgreSQL SSL
 
 import os
 import sys
-import uuid
-import bleach
 import secrets
 import re
-from urllib.parse import urlparse
 from datetime import datetime, timedelta
 
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, abort
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, abort, Response, stream_with_context, g
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
-from werkzeug.utils import secure_filename
+from werkzeug.exceptions import HTTPException
+from sqlalchemy import text
+from sqlalchemy.orm import load_only, noload
+
+from compression import init_compression, no_compress, render_page, streamed
+from content_transfer import FORMATS, content_transfer
+from dashboard import dashboard
+from degraded_mode import CircuitBreaker, db_deadline, degraded_mode
+from fragment_cache import init_fragment_cache
+from logging_setup import get_logger, init_request_logging
+from related_posts import related_posts
+from storage import UploadRequest, image_upload, public_url, save_file, upload_limit
+from view_counter import view_counter
+from utils.sql import upsert_insert
+from utils.validators import validate_url
 
 # ========================================
 # CONFIGURAÇÃO INICIAL
 # ========================================
 
 app = Flask(__name__)
+app.request_class = UploadRequest
+
+logger = get_logger('app')
 
 # CONFIGURAÇÕES CRÍTICAS - OBRIGATÓRIAS PARA RENDER
 # ==================================================
@@ -34,7 +48,7 @@ app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', secrets.token_hex(32))
 DATABASE_URL = os.environ.get('DATABASE_URL')
 
 if not DATABASE_URL:
-    print("ERRO CRÍTICO: DATABASE_URL não configurada!")
+    logger.critical("ERRO CRÍTICO: DATABASE_URL não configurada!")
     sys.exit(1)
 
 # Converter postgres:// para postgresql:// (necessário para SQLAlchemy)
@@ -63,14 +77,16 @@ app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
     'pool_size': 5,
     'max_overflow': 10,
     'pool_timeout': 30,
-    'connect_args': {
+}
+if DATABASE_URL.startswith("postgresql://"):
+    # Parâmetros do psycopg2; o SQLite (desenvolvimento e testes) não os aceita
+    app.config['SQLALCHEMY_ENGINE_OPTIONS']['connect_args'] = {
         'connect_timeout': 10,
         'keepalives_idle': 30,
         'keepalives_interval': 10,
         'keepalives_count': 5,
         'sslmode': 'require'
     }
-}
 
 # 3. CONFIGURAÇÕES ADMIN - USAR DO RENDER
 ADMIN_URL_PREFIX = os.environ.get('ADMIN_URL_PREFIX', '/gestao-exclusiva-netfyber')
@@ -83,6 +99,62 @@ app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
 app.config['UPLOAD_FOLDER'] = os.path.join('static', 'uploads', 'blog')
 app.config['MAX_CONTENT_LENGTH'] = 8 * 1024 * 1024  # 8MB
 app.config['ALLOWED_EXTENSIONS'] = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+app.config['ADMIN_PAGE_SIZE'] = int(os.environ.get('ADMIN_PAGE_SIZE', 25))
+
+# 5. CLOUDFLARE R2 (S3 compatível) - usado por storage.py
+app.config['S3_ENABLED'] = os.environ.get('S3_ENABLED', 'false').lower() == 'true'
+app.config['S3_BUCKET'] = os.environ.get('S3_BUCKET')
+app.config['S3_REGION'] = os.environ.get('S3_REGION', 'auto')
+app.config['S3_ENDPOINT_URL'] = os.environ.get('S3_ENDPOINT_URL')
+app.config['S3_ACCESS_KEY_ID'] = os.environ.get('S3_ACCESS_KEY_ID')
+app.config['S3_SECRET_ACCESS_KEY'] = os.environ.get('S3_SECRET_ACCESS_KEY')
+# Domínio público do bucket (r2.dev ou domínio próprio) usado nas URLs das imagens
+app.config['S3_PUBLIC_URL'] = os.environ.get('S3_PUBLIC_URL')
+
+# 6. COLETA DE UPLOADS ÓRFÃOS (upload_gc.py)
+app.config['UPLOAD_GC_GRACE_HOURS'] = int(os.environ.get('UPLOAD_GC_GRACE_HOURS', 24))
+app.config['UPLOAD_GC_BATCH_SIZE'] = int(os.environ.get('UPLOAD_GC_BATCH_SIZE', 100))
+app.config['UPLOAD_GC_BATCH_PAUSE'] = float(os.environ.get('UPLOAD_GC_BATCH_PAUSE', 0.5))
+
+# 7. LOGGING (logging_setup.py)
+app.config['LOG_REQUEST_SAMPLE_RATE'] = float(os.environ.get('LOG_REQUEST_SAMPLE_RATE', 0.1))
+app.config['LOG_SLOW_REQUEST_MS'] = int(os.environ.get('LOG_SLOW_REQUEST_MS', 1000))
+
+# 8. CACHE DE TEMPLATES (fragment_cache.py)
+app.config['FRAGMENT_CACHE_ENABLED'] = os.environ.get('FRAGMENT_CACHE_ENABLED', 'true').lower() == 'true'
+app.config['FRAGMENT_CACHE_TTL'] = int(os.environ.get('FRAGMENT_CACHE_TTL', 300))
+app.config['FRAGMENT_CACHE_VERSION_TTL'] = float(os.environ.get('FRAGMENT_CACHE_VERSION_TTL', 2))
+app.config['TEMPLATE_BYTECODE_CACHE_DIR'] = os.environ.get('TEMPLATE_BYTECODE_CACHE_DIR')
+
+# 9. CONTADOR DE VISUALIZAÇÕES (view_counter.py)
+app.config['VIEW_COUNTER_FLUSH_INTERVAL'] = float(os.environ.get('VIEW_COUNTER_FLUSH_INTERVAL', 5))
+app.config['VIEW_COUNTER_TOP_N'] = int(os.environ.get('VIEW_COUNTER_TOP_N', 5))
+
+# 10. STREAMING E COMPRESSÃO DAS RESPOSTAS (compression.py)
+app.config['STREAM_TEMPLATES'] = os.environ.get('STREAM_TEMPLATES', 'true').lower() == 'true'
+app.config['STREAM_CHUNK_SIZE'] = int(os.environ.get('STREAM_CHUNK_SIZE', 8192))
+app.config['COMPRESS_ENABLED'] = os.environ.get('COMPRESS_ENABLED', 'true').lower() == 'true'
+app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 500))
+app.config['COMPRESS_MAX_SIZE'] = int(os.environ.get('COMPRESS_MAX_SIZE', 4 * 1024 * 1024))
+app.config['COMPRESS_GZIP_LEVEL'] = int(os.environ.get('COMPRESS_GZIP_LEVEL', 6))
+app.config['COMPRESS_BR_QUALITY'] = int(os.environ.get('COMPRESS_BR_QUALITY', 4))
+
+# 11. EXPORTAÇÃO/IMPORTAÇÃO EM MASSA (content_transfer.py)
+app.config['TRANSFER_BATCH_SIZE'] = int(os.environ.get('TRANSFER_BATCH_SIZE', 1000))
+app.config['IMPORT_MAX_CONTENT_LENGTH'] = int(os.environ.get('IMPORT_MAX_CONTENT_LENGTH', 200 * 1024 * 1024))
+
+# 12. MODO DEGRADADO COM SNAPSHOT DO CONTEÚDO (degraded_mode.py)
+app.config['DEGRADED_SNAPSHOT_PATH'] = os.environ.get('DEGRADED_SNAPSHOT_PATH')
+app.config['DEGRADED_SNAPSHOT_INTERVAL'] = int(os.environ.get('DEGRADED_SNAPSHOT_INTERVAL', 60))
+app.config['DEGRADED_SNAPSHOT_POSTS'] = int(os.environ.get('DEGRADED_SNAPSHOT_POSTS', 50))
+app.config['DB_STATEMENT_TIMEOUT_MS'] = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 2000))
+app.config['CIRCUIT_BREAKER_FAILURES'] = int(os.environ.get('CIRCUIT_BREAKER_FAILURES', 3))
+app.config['CIRCUIT_BREAKER_RESET'] = int(os.environ.get('CIRCUIT_BREAKER_RESET', 30))
+
+# 13. POSTS RELACIONADOS (related_posts.py)
+app.config['RELATED_POSTS_K'] = int(os.environ.get('RELATED_POSTS_K', 4))
+app.config['RELATED_POSTS_MAX_DF'] = float(os.environ.get('RELATED_POSTS_MAX_DF', 0.05))
+app.config['RELATED_POSTS_MAX_TERMS'] = int(os.environ.get('RELATED_POSTS_MAX_TERMS', 20))
 
 # Inicializar extensões
 db = SQLAlchemy(app)
@@ -93,6 +165,9 @@ login_manager.login_view = 'admin_login'
 login_manager.login_message = "Por favor, faça login para acessar esta área."
 login_manager.login_message_category = "warning"
 
+init_request_logging(app)
+init_compression(app)
+
 # ========================================
 # MODELOS DO BANCO DE DADOS
 # ========================================
@@ -129,6 +204,9 @@ class Configuracao(db.Model):
 
 class Plano(db.Model):
     __tablename__ = 'planos'
+    __table_args__ = (
+        db.Index('ix_planos_ativo_ordem', 'ativo', 'ordem_exibicao'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(100), nullable=False)
@@ -139,6 +217,7 @@ class Plano(db.Model):
     ordem_exibicao = db.Column(db.Integer, default=0)
     ativo = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def get_features_list(self):
         if not self.features:
@@ -147,6 +226,9 @@ class Plano(db.Model):
 
 class Post(db.Model):
     __tablename__ = 'posts'
+    __table_args__ = (
+        db.Index('ix_posts_ativo_data', 'ativo', 'data_publicacao'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     titulo = db.Column(db.String(200), nullable=False)
@@ -158,6 +240,11 @@ class Post(db.Model):
     data_publicacao = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     ativo = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Registro do arquivo da imagem (onde está armazenado); carregado em lote com os posts
+    upload = db.relationship('Upload', primaryjoin='foreign(Post.imagem) == Upload.filename',
+                             uselist=False, viewonly=True, lazy='selectin')
     
     def get_conteudo_html(self):
         if not self.conteudo:
@@ -172,6 +259,8 @@ class Post(db.Model):
                        'ul', 'ol', 'li', 'h1', 'h2', 'h3', 'h4', 'blockquote']
         allowed_attrs = {'a': ['href', 'target', 'rel', 'title']}
         
+        # Importado sob demanda; com preload do gunicorn já vem carregado do master
+        import bleach
         sanitized = bleach.clean(content, tags=allowed_tags, attributes=allowed_attrs, strip=True)
         
         def add_link_attributes(attrs, new):
@@ -189,7 +278,63 @@ class Post(db.Model):
     def get_imagem_url(self):
         if not self.imagem or self.imagem == 'default.jpg':
             return '/static/images/blog/default.jpg'
-        return f'/static/uploads/blog/{self.imagem}'
+        if self.upload is not None:
+            storage_type = self.upload.storage_type
+        else:
+            # Post fora da sessão (snapshot do modo degradado): vale o backend configurado
+            storage_type = 's3' if app.config.get('S3_ENABLED') else 'local'
+        return public_url(self.imagem, storage_type)
+
+class VisualizacaoPost(db.Model):
+    """Total de visualizações por post, gravado em lote pelo view_counter"""
+    __tablename__ = 'post_visualizacoes'
+    
+    post_id = db.Column(db.Integer, db.ForeignKey('posts.id', ondelete='CASCADE'), primary_key=True)
+    total = db.Column(db.BigInteger, nullable=False, default=0, index=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class PostRelacionado(db.Model):
+    """Vizinhos mais parecidos de cada post, calculados pelo related_posts"""
+    __tablename__ = 'posts_relacionados'
+    
+    post_id = db.Column(db.Integer, db.ForeignKey('posts.id', ondelete='CASCADE'), primary_key=True)
+    posicao = db.Column(db.SmallInteger, primary_key=True)
+    relacionado_id = db.Column(db.Integer, db.ForeignKey('posts.id', ondelete='CASCADE'), nullable=False, index=True)
+    score = db.Column(db.Float, nullable=False)
+
+class Upload(db.Model):
+    """Arquivo armazenado pelo hash do conteúdo, com contagem de referências"""
+    __tablename__ = 'uploads'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    filename = db.Column(db.String(100), unique=True, nullable=False)
+    sha256 = db.Column(db.String(64), nullable=False)
+    storage_type = db.Column(db.String(10), nullable=False, default='local')
+    content_type = db.Column(db.String(50))
+    tamanho = db.Column(db.Integer, default=0)
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class VersaoCache(db.Model):
+    """Carimbo de versão compartilhado entre os workers (fragment_cache)"""
+    __tablename__ = 'versoes_cache'
+    
+    nome = db.Column(db.String(50), primary_key=True)
+    versao = db.Column(db.Integer, nullable=False, default=0)
+
+# Fragmentos do layout dependem das configurações e dos planos
+init_fragment_cache(app, db, (Configuracao, Plano), VersaoCache)
+
+view_counter.init_app(app, db, VisualizacaoPost, Post)
+dashboard.init_app(db, Post, Plano, Upload)
+related_posts.init_app(app, db, Post, PostRelacionado)
+# Conteúdo público que continua no ar (do snapshot) se o banco cair
+degraded_mode.init_app(app, db, {
+    'configs': (None, lambda: {config.chave: config.valor for config in Configuracao.query.all()}),
+    'planos': (Plano, lambda: Plano.query.filter_by(ativo=True).order_by(Plano.ordem_exibicao).all()),
+    'posts': (Post, lambda: Post.query.filter_by(ativo=True).order_by(Post.data_publicacao.desc())
+              .limit(app.config['DEGRADED_SNAPSHOT_POSTS']).all()),
+})
 
 # ========================================
 # INICIALIZAÇÃO DO BANCO
@@ -203,20 +348,140 @@ def load_user(user_id):
         return None
 
 def get_configs():
-    try:
-        configs = {}
-        for config in Configuracao.query.all():
-            configs[config.chave] = config.valor
-        return configs
-    except Exception as e:
-        print(f"Erro ao carregar configurações: {e}")
-        return {}
+    return degraded_mode.fetch('configs')
 
 def sanitize_input(text):
     if not text:
         return ""
+    import bleach
     return bleach.clean(text.strip(), tags=[], attributes={}, strip=True)
 
+def registrar_upload(arquivo):
+    """Salva a imagem enviada e incrementa sua contagem de referências.
+    
+    Uploads de conteúdo idêntico reaproveitam o mesmo objeto armazenado.
+    """
+    info = save_file(arquivo)
+    if not info:
+        return None
+    
+    # UPSERT no nome único: envios simultâneos do mesmo arquivo somam a referência
+    table = Upload.__table__
+    stmt = upsert_insert(db, table).values(
+        filename=info['filename'],
+        sha256=info['sha256'],
+        storage_type=info['storage_type'],
+        content_type=info['content_type'],
+        tamanho=info['size'],
+        ref_count=1,
+        created_at=datetime.utcnow()
+    )
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=[table.c.filename],
+        set_={'ref_count': table.c.ref_count + 1}
+    ))
+    return info['filename']
+
+def liberar_upload(filename):
+    """Decrementa a contagem de referências; arquivos sem referência são removidos pelo upload_gc.py"""
+    if not filename or filename == 'default.jpg':
+        return
+    # Decremento no próprio UPDATE, coerente com o UPSERT de registrar_upload
+    Upload.query.filter(Upload.filename == filename, Upload.ref_count > 0).update(
+        {Upload.ref_count: Upload.ref_count - 1}, synchronize_session=False
+    )
+
+def gerar_resumo(conteudo, limite=200):
+    texto = re.sub(r'\*\*?(.*?)\*\*?', r'\1', conteudo)
+    texto = ' '.join(sanitize_input(texto).split())
+    if len(texto) <= limite:
+        return texto
+    return texto[:limite].rsplit(' ', 1)[0] + '...'
+
+CATEGORIAS_POST = ('tecnologia', 'noticias')
+
+def _sanitizar_campos(campos, nomes):
+    for nome in nomes:
+        if campos.get(nome) is not None:
+            campos[nome] = sanitize_input(campos[nome])
+
+def limpar_plano(campos):
+    """Sanitiza e valida os campos presentes de um plano (formulário ou importação).
+    
+    Campos ausentes não são conferidos: na importação eles mantêm o valor atual.
+    Retorna a mensagem de erro ou None.
+    """
+    _sanitizar_campos(campos, ('nome', 'preco', 'velocidade'))
+    if campos.get('features') is not None:
+        campos['features'] = '\n'.join(
+            sanitize_input(linha) for linha in campos['features'].splitlines() if linha.strip()
+        )
+    if any(campo in campos and not campos[campo] for campo in ('nome', 'preco', 'features')):
+        return 'Preencha todos os campos obrigatórios.'
+    return None
+
+def limpar_post(campos):
+    """Sanitiza e valida os campos presentes de um post (formulário ou importação).
+    
+    Campos ausentes não são conferidos: na importação eles mantêm o valor atual.
+    Retorna a mensagem de erro ou None.
+    """
+    _sanitizar_campos(campos, ('titulo', 'resumo'))
+    for campo in ('categoria', 'conteudo', 'link_materia'):
+        if campos.get(campo) is not None:
+            campos[campo] = campos[campo].strip()
+    if any(campo in campos and not campos[campo] for campo in ('titulo', 'conteudo', 'link_materia')):
+        return 'Preencha todos os campos obrigatórios.'
+    if 'categoria' in campos and campos['categoria'] not in CATEGORIAS_POST:
+        return 'Categoria inválida.'
+    if 'link_materia' in campos and not validate_url(campos['link_materia']):
+        return 'Link da matéria inválido.'
+    return None
+
+def limpar_configuracao(campos):
+    """Sanitiza o valor da configuração como a tela de configurações; retorna a mensagem de erro ou None"""
+    if 'chave' in campos and not (campos['chave'] or '').strip():
+        return 'Chave da configuração obrigatória.'
+    _sanitizar_campos(campos, ('valor', 'descricao'))
+    return None
+
+def preencher_plano(plano, form):
+    """Valida o formulário do plano e copia os campos; retorna a mensagem de erro ou None"""
+    campos = {campo: form.get(campo, '') for campo in ('nome', 'preco', 'velocidade', 'features')}
+    erro = limpar_plano(campos)
+    if erro:
+        return erro
+    
+    for campo, valor in campos.items():
+        setattr(plano, campo, valor)
+    plano.recomendado = 'recomendado' in form
+    return None
+
+def preencher_post(post, form):
+    """Valida o formulário do post e copia os campos; retorna a mensagem de erro ou None"""
+    campos = {campo: form.get(campo, '') for campo in ('titulo', 'categoria', 'conteudo', 'link_materia')}
+    erro = limpar_post(campos)
+    if erro:
+        return erro
+    try:
+        data_publicacao = datetime.strptime(form.get('data_publicacao', '').strip(), '%d/%m/%Y')
+    except ValueError:
+        return 'Data de publicação inválida. Use o formato DD/MM/AAAA.'
+    
+    for campo, valor in campos.items():
+        setattr(post, campo, valor)
+    post.resumo = gerar_resumo(post.conteudo)
+    post.data_publicacao = data_publicacao
+    return None
+
+# Importação em massa: cada registro passa pelas mesmas regras dos formulários
+content_transfer.init_app(app, db, {
+    'posts': (Post, 'id', (), limpar_post),
+    'planos': (Plano, 'id', (), limpar_plano),
+    # Configurações são identificadas pela chave; o id de outro banco não vale aqui
+    'configuracoes': (Configuracao, 'chave', ('id',), limpar_configuracao),
+})
+
 # Variável para controlar inicialização
 _db_initialized = False
 
@@ -228,11 +493,11 @@ def initialize_database():
         return
     
     try:
-        print("🚀 Inicializando banco de dados...")
+        logger.info("Inicializando banco de dados...")
         
         # Criar tabelas se não existirem
         db.create_all()
-        print("✅ Tabelas criadas/verificadas")
+        logger.info("Tabelas criadas/verificadas")
         
         # CRIAR USUÁRIO ADMIN A PARTIR DAS VARIÁVEIS DO RENDER
         admin_username = os.environ.get('ADMIN_USERNAME')
@@ -244,7 +509,7 @@ def initialize_database():
             existing_admin = AdminUser.query.filter_by(username=admin_username).first()
             
             if not existing_admin:
-                print(f"👤 Criando usuário admin: {admin_username}")
+                logger.info(f"Criando usuário admin: {admin_username}")
                 admin = AdminUser(
                     username=admin_username,
                     email=admin_email if admin_email else f"{admin_username}@netfyber.com",
@@ -252,21 +517,23 @@ def initialize_database():
                 )
                 admin.set_password(admin_password)
                 db.session.add(admin)
-                print(f"✅ Usuário admin criado: {admin_username}")
+                logger.info(f"Usuário admin criado: {admin_username}")
             else:
-                print(f"ℹ️ Usuário admin já existe: {admin_username}")
+                logger.info(f"Usuário admin já existe: {admin_username}")
                 # Atualizar senha se necessário
                 if admin_password and not existing_admin.check_password(admin_password):
                     existing_admin.set_password(admin_password)
-                    print(f"🔑 Senha do admin atualizada")
+                    logger.info("Senha do admin atualizada")
         else:
-            print("⚠️ Variáveis ADMIN_USERNAME ou ADMIN_PASSWORD não configuradas no Render")
-            print(f"   ADMIN_USERNAME: {'[CONFIGURADO]' if admin_username else '[FALTANDO]'}")
-            print(f"   ADMIN_PASSWORD: {'[CONFIGURADO]' if admin_password else '[FALTANDO]'}")
+            logger.warning(
+                "Variáveis ADMIN_USERNAME ou ADMIN_PASSWORD não configuradas no Render "
+                f"(ADMIN_USERNAME: {'[CONFIGURADO]' if admin_username else '[FALTANDO]'}, "
+                f"ADMIN_PASSWORD: {'[CONFIGURADO]' if admin_password else '[FALTANDO]'})"
+            )
         
         # Criar configurações padrão se não existirem
         if Configuracao.query.count() == 0:
-            print("⚙️ Criando configurações padrão...")
+            logger.info("Criando configurações padrão...")
             configs = [
                 ('telefone_contato', '(63) 8494-1778', 'Telefone de contato'),
                 ('email_contato', 'contato@netfyber.com', 'Email de contato'),
@@ -283,11 +550,11 @@ def initialize_database():
             for chave, valor, descricao in configs:
                 config = Configuracao(chave=chave, valor=valor, descricao=descricao)
                 db.session.add(config)
-            print("✅ Configurações padrão criadas")
+            logger.info("Configurações padrão criadas")
         
         # Criar planos padrão se não existirem
         if Plano.query.count() == 0:
-            print("📊 Criando planos padrão...")
+            logger.info("Criando planos padrão...")
             planos = [
                 Plano(nome='100 MEGA', preco='89,90', velocidade='100 Mbps', 
                       features='Wi-Fi Grátis\nInstalação Grátis\nSuporte 24h\nFibra Óptica'),
@@ -299,17 +566,15 @@ def initialize_database():
             
             for plano in planos:
                 db.session.add(plano)
-            print("✅ Planos padrão criados")
+            logger.info("Planos padrão criados")
         
         db.session.commit()
         _db_initialized = True
-        print("🎉 Banco de dados inicializado com sucesso!")
+        logger.info("Banco de dados inicializado com sucesso!")
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ ERRO CRÍTICO ao inicializar banco: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"ERRO CRÍTICO ao inicializar banco: {e}")
         # Não levantamos a exceção para permitir que o app tente carregar sem o banco
 
 # Middleware para inicializar antes do primeiro request
@@ -317,42 +582,70 @@ def initialize_database():
 def before_request_handler():
     """Executa antes de cada request para garantir banco inicializado"""
     try:
-        if not _db_initialized:
+        # Com o circuito aberto não adianta esperar o connect_timeout a cada request
+        if not _db_initialized and not degraded_mode.breaker.is_open():
             initialize_database()
     except Exception as e:
-        print(f"⚠️ Aviso na inicialização: {e}")
+        logger.warning(f"Aviso na inicialização: {e}")
 
 # ========================================
 # ROTAS PÚBLICAS
 # ========================================
 
 @app.route('/')
+@db_deadline(1000)
 def index():
     return render_template('public/index.html', configs=get_configs())
 
 @app.route('/planos')
+@streamed
+@db_deadline(1000)
 def planos():
-    try:
-        planos_data = Plano.query.filter_by(ativo=True).order_by(Plano.ordem_exibicao).all()
-    except Exception as e:
-        print(f"Erro ao carregar planos: {e}")
-        planos_data = []
-    return render_template('public/planos.html', planos=planos_data, configs=get_configs())
+    planos_data = degraded_mode.fetch('planos')
+    return render_page('public/planos.html', planos=planos_data, configs=get_configs())
 
 @app.route('/blog')
+@streamed
+@db_deadline(3000)
 def blog():
-    try:
-        posts = Post.query.filter_by(ativo=True).order_by(Post.data_publicacao.desc()).all()
-    except Exception as e:
-        print(f"Erro ao carregar posts: {e}")
-        posts = []
-    return render_template('public/blog.html', configs=get_configs(), posts=posts)
+    # No modo degradado saem só os posts recentes guardados no snapshot
+    posts = degraded_mode.fetch(
+        'posts', lambda: Post.query.filter_by(ativo=True).order_by(Post.data_publicacao.desc()).all()
+    )
+    
+    relacionados = {}
+    if not g.get('degraded_mode'):
+        try:
+            relacionados = related_posts.lookup(post.id for post in posts)
+        except Exception as e:
+            db.session.rollback()
+            logger.exception(f"Erro ao carregar posts relacionados: {e}")
+    
+    posts_por_id = {post.id: post for post in posts}
+    mais_lidos = [
+        (posts_por_id[post_id], total)
+        for post_id, total in view_counter.top()
+        if post_id in posts_por_id
+    ]
+    return render_page('public/blog.html', configs=get_configs(), posts=posts, mais_lidos=mais_lidos,
+                       relacionados=relacionados)
+
+@app.route('/blog/<int:post_id>/ler')
+def ler_post(post_id):
+    """Conta a leitura e redireciona para a matéria completa"""
+    post = db.session.get(Post, post_id)
+    if not post or not post.ativo:
+        abort(404)
+    view_counter.increment(post.id)
+    return redirect(post.link_materia)
 
 @app.route('/velocimetro')
+@db_deadline(1000)
 def velocimetro():
     return render_template('public/velocimetro.html', configs=get_configs())
 
 @app.route('/sobre')
+@db_deadline(1000)
 def sobre():
     return render_template('public/sobre.html', configs=get_configs())
 
@@ -386,7 +679,7 @@ def admin_login():
                 
         except Exception as e:
             flash(f'Erro no servidor: {str(e)}', 'error')
-            print(f"Erro no login: {e}")
+            logger.exception(f"Erro no login: {e}")
     
     return render_template('auth/login.html')
 
@@ -404,24 +697,258 @@ def admin_logout():
 @app.route(f'{ADMIN_URL_PREFIX}/planos')
 @login_required
 def admin_planos():
+    paginacao, stats = None, {}
     try:
-        planos_data = Plano.query.filter_by(ativo=True).order_by(Plano.ordem_exibicao).all()
+        paginacao = (
+            Plano.query
+            .options(load_only(Plano.id, Plano.nome, Plano.preco, Plano.velocidade,
+                               Plano.features, Plano.recomendado, Plano.ativo))
+            .filter_by(ativo=True)
+            .order_by(Plano.ordem_exibicao)
+            .paginate(page=request.args.get('page', 1, type=int),
+                      per_page=app.config['ADMIN_PAGE_SIZE'], error_out=False)
+        )
+        stats = dashboard.plano_stats()
     except Exception as e:
-        print(f"Erro ao carregar planos: {e}")
-        planos_data = []
+        db.session.rollback()
+        logger.exception(f"Erro ao carregar planos: {e}")
         flash('Erro ao carregar planos.', 'error')
-    return render_template('admin/planos.html', planos=planos_data)
+    planos_data = paginacao.items if paginacao else []
+    return render_template('admin/planos.html', planos=planos_data, paginacao=paginacao, stats=stats)
+
+@app.route(f'{ADMIN_URL_PREFIX}/planos/adicionar', methods=['GET', 'POST'])
+@login_required
+def adicionar_plano():
+    if request.method == 'POST':
+        try:
+            plano = Plano()
+            erro = preencher_plano(plano, request.form)
+            if erro:
+                flash(erro, 'error')
+            else:
+                ultima_ordem = db.session.query(db.func.max(Plano.ordem_exibicao)).scalar() or 0
+                plano.ordem_exibicao = ultima_ordem + 1
+                db.session.add(plano)
+                db.session.commit()
+                flash('Plano adicionado!', 'success')
+                return redirect(url_for('admin_planos'))
+        except Exception as e:
+            db.session.rollback()
+            flash(f'Erro: {str(e)}', 'error')
+    
+    return render_template('admin/plano_form.html', plano=None)
+
+@app.route(f'{ADMIN_URL_PREFIX}/planos/<int:plano_id>/editar', methods=['GET', 'POST'])
+@login_required
+def editar_plano(plano_id):
+    plano = db.session.get(Plano, plano_id) or abort(404)
+    
+    if request.method == 'POST':
+        try:
+            erro = preencher_plano(plano, request.form)
+            if erro:
+                db.session.rollback()
+                flash(erro, 'error')
+            else:
+                db.session.commit()
+                flash('Plano atualizado!', 'success')
+                return redirect(url_for('admin_planos'))
+        except Exception as e:
+            db.session.rollback()
+            flash(f'Erro: {str(e)}', 'error')
+    
+    return render_template('admin/plano_form.html', plano=plano)
+
+@app.route(f'{ADMIN_URL_PREFIX}/planos/<int:plano_id>/excluir', methods=['POST'])
+@login_required
+def excluir_plano(plano_id):
+    plano = db.session.get(Plano, plano_id) or abort(404)
+    try:
+        db.session.delete(plano)
+        db.session.commit()
+        flash('Plano excluído!', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Erro: {str(e)}', 'error')
+    return redirect(url_for('admin_planos'))
 
 @app.route(f'{ADMIN_URL_PREFIX}/blog')
 @login_required
 def admin_blog():
+    paginacao, stats = None, {}
     try:
-        posts = Post.query.filter_by(ativo=True).order_by(Post.data_publicacao.desc()).all()
+        # Só as colunas da listagem: o conteúdo completo fica adiado e a
+        # imagem (Post.upload, selectin) não é exibida aqui
+        paginacao = (
+            Post.query
+            .options(load_only(Post.id, Post.titulo, Post.resumo, Post.categoria,
+                               Post.data_publicacao, Post.ativo, Post.link_materia),
+                     noload(Post.upload))
+            .filter_by(ativo=True)
+            .order_by(Post.data_publicacao.desc())
+            .paginate(page=request.args.get('page', 1, type=int),
+                      per_page=app.config['ADMIN_PAGE_SIZE'], error_out=False)
+        )
+        stats = dashboard.post_stats()
     except Exception as e:
-        print(f"Erro ao carregar posts: {e}")
-        posts = []
+        db.session.rollback()
+        logger.exception(f"Erro ao carregar posts: {e}")
         flash('Erro ao carregar posts.', 'error')
-    return render_template('admin/blog.html', posts=posts)
+    posts = paginacao.items if paginacao else []
+    
+    try:
+        visualizacoes = view_counter.counts(post.id for post in posts)
+    except Exception as e:
+        db.session.rollback()
+        logger.exception(f"Erro ao carregar visualizações: {e}")
+        visualizacoes = {}
+    return render_template('admin/blog.html', posts=posts, paginacao=paginacao, stats=stats,
+                           visualizacoes=visualizacoes)
+
+@app.route(f'{ADMIN_URL_PREFIX}/painel')
+@login_required
+def admin_dashboard():
+    try:
+        painel = {
+            'posts': dashboard.post_stats(),
+            'planos': dashboard.plano_stats(),
+            'armazenamento': dashboard.storage_stats(),
+            'atividade': dashboard.recent_activity(),
+        }
+    except Exception as e:
+        db.session.rollback()
+        logger.exception(f"Erro ao carregar painel: {e}")
+        painel = {'posts': {}, 'planos': {}, 'armazenamento': {}, 'atividade': []}
+        flash('Erro ao carregar painel.', 'error')
+    return render_template('admin/dashboard.html', painel=painel)
+
+@app.route(f'{ADMIN_URL_PREFIX}/dados', methods=['GET', 'POST'])
+@login_required
+@upload_limit('IMPORT_MAX_CONTENT_LENGTH')
+def admin_dados():
+    relatorio = None
+    if request.method == 'POST':
+        entidade = request.form.get('entidade', '')
+        arquivo = request.files.get('arquivo')
+        simular = request.form.get('simular') == 'on'
+        if not arquivo or not arquivo.filename:
+            flash('Selecione um arquivo para importar.', 'error')
+        else:
+            formato = 'csv' if arquivo.filename.lower().endswith('.csv') else 'ndjson'
+            try:
+                relatorio = content_transfer.import_rows(
+                    entidade, content_transfer.parse(entidade, arquivo.stream, formato), dry_run=simular
+                )
+                logger.info(f"Importação de {entidade} ({'simulação' if simular else 'aplicada'}): "
+                            f"{relatorio['inserir']} novos, {relatorio['atualizar']} alterados, "
+                            f"{relatorio['rejeitados']} rejeitados")
+                if not simular:
+                    if entidade == 'posts':
+                        related_posts.schedule()
+                    flash('Importação concluída!', 'success')
+            except (ValueError, UnicodeDecodeError) as e:
+                flash(f'Arquivo inválido: {str(e)}', 'error')
+            except Exception as e:
+                logger.exception(f"Erro ao importar {entidade}: {e}")
+                flash(f'Erro: {str(e)}', 'error')
+    return render_template('admin/dados.html', entidades=list(content_transfer.entities),
+                           formatos=list(FORMATS), relatorio=relatorio)
+
+@app.route(f'{ADMIN_URL_PREFIX}/dados/<entidade>.<formato>')
+@login_required
+@no_compress
+def exportar_dados(entidade, formato):
+    if entidade not in content_transfer.entities or formato not in FORMATS:
+        abort(404)
+    nome = f"{entidade}-{datetime.now().strftime('%Y%m%d-%H%M')}.{formato}"
+    return Response(
+        stream_with_context(content_transfer.export(entidade, formato)),
+        mimetype=FORMATS[formato],
+        headers={'Content-Disposition': f'attachment; filename="{nome}"'}
+    )
+
+@app.route(f'{ADMIN_URL_PREFIX}/blog/adicionar', methods=['GET', 'POST'])
+@login_required
+@image_upload
+def adicionar_post():
+    if request.method == 'POST':
+        try:
+            post = Post()
+            erro = preencher_post(post, request.form)
+            arquivo = request.files.get('imagem')
+            if not erro and arquivo and arquivo.filename:
+                post.imagem = registrar_upload(arquivo)
+                if not post.imagem:
+                    erro = 'Imagem inválida. Envie um arquivo PNG, JPEG, GIF ou WEBP.'
+            if erro:
+                db.session.rollback()
+                flash(erro, 'error')
+            else:
+                db.session.add(post)
+                db.session.commit()
+                related_posts.schedule(post.id)
+                flash('Post adicionado!', 'success')
+                return redirect(url_for('admin_blog'))
+        except HTTPException as e:
+            db.session.rollback()
+            flash(e.description, 'error')
+        except Exception as e:
+            db.session.rollback()
+            flash(f'Erro: {str(e)}', 'error')
+    
+    return render_template('admin/post_form.html', post=None,
+                           data_hoje=datetime.now().strftime('%d/%m/%Y'))
+
+@app.route(f'{ADMIN_URL_PREFIX}/blog/<int:post_id>/editar', methods=['GET', 'POST'])
+@login_required
+@image_upload
+def editar_post(post_id):
+    post = db.session.get(Post, post_id) or abort(404)
+    
+    if request.method == 'POST':
+        try:
+            imagem_anterior = post.imagem
+            erro = preencher_post(post, request.form)
+            arquivo = request.files.get('imagem')
+            if not erro and arquivo and arquivo.filename:
+                nova_imagem = registrar_upload(arquivo)
+                if nova_imagem:
+                    post.imagem = nova_imagem
+                    liberar_upload(imagem_anterior)
+                else:
+                    erro = 'Imagem inválida. Envie um arquivo PNG, JPEG, GIF ou WEBP.'
+            if erro:
+                db.session.rollback()
+                flash(erro, 'error')
+            else:
+                db.session.commit()
+                related_posts.schedule(post.id)
+                flash('Post atualizado!', 'success')
+                return redirect(url_for('admin_blog'))
+        except HTTPException as e:
+            db.session.rollback()
+            flash(e.description, 'error')
+        except Exception as e:
+            db.session.rollback()
+            flash(f'Erro: {str(e)}', 'error')
+    
+    return render_template('admin/post_form.html', post=post,
+                           data_hoje=post.get_data_formatada())
+
+@app.route(f'{ADMIN_URL_PREFIX}/blog/<int:post_id>/excluir', methods=['POST'])
+@login_required
+def excluir_post(post_id):
+    post = db.session.get(Post, post_id) or abort(404)
+    try:
+        liberar_upload(post.imagem)
+        db.session.delete(post)
+        db.session.commit()
+        related_posts.schedule(post_id)
+        flash('Post excluído!', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Erro: {str(e)}', 'error')
+    return redirect(url_for('admin_blog'))
 
 @app.route(f'{ADMIN_URL_PREFIX}/configuracoes', methods=['GET', 'POST'])
 @login_required
@@ -450,17 +977,28 @@ def admin_configuracoes():
 
 @app.route('/health')
 def health_check():
-    try:
-        # Testar conexão com banco
-        db.session.execute('SELECT 1')
-        db_status = 'healthy'
-    except Exception as e:
-        db_status = f'error: {str(e)}'
+    breaker = degraded_mode.breaker
+    if breaker.allow():
+        try:
+            # Testar conexão com banco (também serve de teste para o circuito)
+            degraded_mode.apply_deadline()
+            db.session.execute(text('SELECT 1'))
+            breaker.record_success()
+            db_status = 'healthy'
+        except Exception as e:
+            db.session.rollback()
+            breaker.record_failure()
+            db_status = f'error: {str(e)}'
+    else:
+        # Circuito aberto: o banco só é testado de novo após CIRCUIT_BREAKER_RESET
+        db_status = 'circuit open'
     
+    # 200 mesmo degradado: as páginas públicas seguem no ar pelo snapshot
     return jsonify({
-        'status': 'ok',
+        'status': 'ok' if breaker.state == CircuitBreaker.CLOSED else 'degraded',
         'database': db_status,
         'initialized': _db_initialized,
+        'degraded_mode': degraded_mode.stats(),
         'timestamp': datetime.utcnow().isoformat()
     })
 
@@ -489,19 +1027,16 @@ if __name__ == '__main__':
     os.makedirs('static/images/blog', exist_ok=True)
     
     # Log inicial
-    print("=" * 60)
-    print("🚀 NETFYBER TELECOM - INICIANDO")
-    print("=" * 60)
-    print(f"🔧 Ambiente: {os.environ.get('FLASK_ENV', 'development')}")
-    print(f"📊 Banco: {DATABASE_URL[:50]}...")
-    print(f"🔐 SSL: {'SIM (sslmode=require)' if 'sslmode=require' in DATABASE_URL else 'NÃO'}")
-    print(f"👤 Admin: {os.environ.get('ADMIN_USERNAME', '[Não configurado]')}")
-    print("=" * 60)
+    logger.info("NETFYBER TELECOM - INICIANDO")
+    logger.info(f"Ambiente: {os.environ.get('FLASK_ENV', 'development')}")
+    logger.info(f"Banco: {DATABASE_URL[:50]}...")
+    logger.info(f"SSL: {'SIM (sslmode=require)' if 'sslmode=require' in DATABASE_URL else 'NÃO'}")
+    logger.info(f"Admin: {os.environ.get('ADMIN_USERNAME', '[Não configurado]')}")
     
     # Tentar inicializar banco
     try:
         initialize_database()
     except Exception as e:
-        print(f"⚠️ Aviso na inicialização: {e}")
+        logger.warning(f"Aviso na inicialização: {e}")
     
     app.run(host='0.0.0.0', port=port, debug=debug_mode)
\ No newline at end of file
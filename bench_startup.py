@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Benchmark de inicialização do app
+Executar: python bench_startup.py [--workers 2] [--port 8799] [--runs 3]
+
+1. Tempo de import do app.py num processo novo e os módulos mais caros
+   (python -X importtime) entre os que o app.py importa.
+2. Sobe o Gunicorn (gunicorn.conf.py) com e sem preload e mostra o tempo até
+   o primeiro request respondido e a memória do master e de cada worker:
+   RSS e PSS (PSS divide as páginas compartilhadas entre os processos, então
+   é o que mostra o ganho do copy-on-write).
+
+Usa as mesmas variáveis de ambiente do app (DATABASE_URL etc.). Memória por
+processo só em Linux (/proc).
+"""
+
+import os
+import sys
+import time
+import signal
+import argparse
+import subprocess
+import urllib.request
+import urllib.error
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+READY_PATH = '/static/images/favicon.png.png'
+
+
+def import_time(runs):
+    """Média do tempo de 'import app' em processos novos (segundos)"""
+    code = 'import time; t = time.perf_counter(); import app; print(time.perf_counter() - t)'
+    times = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', code], cwd=BASE_DIR, capture_output=True, text=True, check=True)
+        times.append(float(output.stdout.strip().splitlines()[-1]))
+    return sum(times) / len(times)
+
+
+def slowest_imports(limit=10):
+    """[(módulo, ms acumulados)] dos imports feitos diretamente pelo app.py"""
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                            cwd=BASE_DIR, capture_output=True, text=True, check=True)
+    totals = {}
+    for line in output.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Recuo de 1 espaço: o próprio app; 3 espaços: o que ele importa
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth == 1:
+            top = name.strip().split('.')[0]
+            totals[top] = totals.get(top, 0) + int(cumulative) / 1000
+    return sorted(totals.items(), key=lambda item: -item[1])[:limit]
+
+
+def memory(pid):
+    """(RSS, PSS) em MB a partir do /proc; PSS é None se o kernel não informar"""
+    values = {}
+    for path, keys in ((f'/proc/{pid}/status', ('VmRSS',)), (f'/proc/{pid}/smaps_rollup', ('Pss',))):
+        try:
+            with open(path) as f:
+                for line in f:
+                    key = line.split(':')[0]
+                    if key in keys:
+                        values[key] = int(line.split()[1]) / 1024
+        except OSError:
+            pass
+    return values.get('VmRSS'), values.get('Pss')
+
+
+def children(pid):
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def run_gunicorn(preload, workers, port, timeout=60):
+    env = dict(os.environ, PORT=str(port), WEB_CONCURRENCY=str(workers), GUNICORN_PRELOAD=str(preload).lower())
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py'],
+        cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        ready = None
+        while time.perf_counter() - started < timeout:
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{port}{READY_PATH}', timeout=1).read()
+                ready = time.perf_counter() - started
+                break
+            except (urllib.error.URLError, ConnectionError, OSError):
+                time.sleep(0.05)
+        # Espera todos os workers terminarem de subir antes de medir
+        deadline = time.perf_counter() + 10
+        while len(children(process.pid)) < workers and time.perf_counter() < deadline:
+            time.sleep(0.1)
+        time.sleep(1)
+        master = memory(process.pid)
+        worker_memory = [memory(pid) for pid in children(process.pid)]
+        return ready, master, worker_memory
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def fmt_mb(value):
+    return f'{value:7.1f} MB' if value is not None else '      - '
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Mede import e memória por worker do Gunicorn')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--port', type=int, default=8799)
+    parser.add_argument('--runs', type=int, default=3, help='repetições do teste de import')
+    args = parser.parse_args()
+
+    print(f"⏱️  import app: {import_time(args.runs) * 1000:.0f} ms (média de {args.runs})")
+    for module, ms in slowest_imports():
+        print(f"   {module:<24} {ms:8.1f} ms")
+
+    if not sys.platform.startswith('linux'):
+        print("Memória por processo só disponível em Linux")
+        sys.exit(0)
+
+    for preload in (True, False):
+        ready, master, worker_memory = run_gunicorn(preload, args.workers, args.port)
+        print(f"\n🚀 Gunicorn {'com' if preload else 'sem'} preload "
+              f"({args.workers} workers): primeiro request em "
+              f"{f'{ready:.2f}s' if ready is not None else 'timeout'}")
+        print(f"   master    RSS {fmt_mb(master[0])}  PSS {fmt_mb(master[1])}")
+        for number, (rss, pss) in enumerate(worker_memory, start=1):
+            print(f"   worker {number}  RSS {fmt_mb(rss)}  PSS {fmt_mb(pss)}")
+        total = sum(pss or 0 for _, pss in [master] + worker_memory)
+        print(f"   total PSS {fmt_mb(total)}")
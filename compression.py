@@ -0,0 +1,171 @@
+"""
+Renderização em streaming e compressão das respostas (gzip/brotli)
+
+- render_page(): nas rotas marcadas com @streamed (e STREAM_TEMPLATES ativo)
+  renderiza com o stream_template do Flask, enviando o <head> assim que ele
+  é gerado e o restante em blocos de STREAM_CHUNK_SIZE bytes; nas demais é o
+  render_template normal.
+- init_compression(): comprime no after_request as respostas de tipos texto,
+  escolhendo brotli ou gzip conforme o Accept-Encoding do cliente. Rotas
+  marcadas com @no_compress (downloads da exportação), arquivos servidos por
+  send_file (/static e demais respostas direct_passthrough, que ficam para o
+  proxy/CDN) e corpos menores que COMPRESS_MIN_SIZE passam direto.
+"""
+
+import zlib
+
+from flask import current_app, request, render_template, stream_template, Response
+
+# Tipos que valem a pena comprimir; imagens, fontes woff2, zip etc. já são comprimidos
+COMPRESSIBLE_TYPES = {
+    'text/html', 'text/css', 'text/plain', 'text/xml', 'text/csv', 'text/javascript',
+    'application/javascript', 'application/json', 'application/xml',
+    'application/x-ndjson', 'image/svg+xml',
+}
+
+_brotli = None
+
+
+def _load_brotli():
+    """Importa o brotli sob demanda; None se o pacote não estiver instalado"""
+    global _brotli
+    if _brotli is None:
+        try:
+            import brotli
+            _brotli = brotli
+        except ImportError:
+            _brotli = False
+    return _brotli or None
+
+
+def streamed(view):
+    """Marca a rota para usar a renderização em streaming"""
+    view.streamed = True
+    return view
+
+
+def no_compress(view):
+    """Desativa a compressão de respostas para a rota"""
+    view.compress = False
+    return view
+
+
+def _current_view():
+    return current_app.view_functions.get(request.endpoint) if request.endpoint else None
+
+
+def _chunked(parts, chunk_size):
+    """Agrupa a saída do template: o <head> sai imediatamente, o resto em blocos"""
+    buffer, size, head_sent = [], 0, False
+    try:
+        for part in parts:
+            buffer.append(part)
+            size += len(part)
+            if not head_sent and '</head>' in part:
+                head_sent = True
+                yield ''.join(buffer)
+                buffer, size = [], 0
+            elif size >= chunk_size:
+                yield ''.join(buffer)
+                buffer, size = [], 0
+        if buffer:
+            yield ''.join(buffer)
+    finally:
+        # Fecha o gerador do Flask, que libera o contexto da requisição
+        close = getattr(parts, 'close', None)
+        if close:
+            close()
+
+
+def render_page(template_name, **context):
+    """render_template ou, nas rotas @streamed, o stream_template do Flask em blocos"""
+    if not current_app.config.get('STREAM_TEMPLATES') or not getattr(_current_view(), 'streamed', False):
+        return render_template(template_name, **context)
+
+    parts = stream_template(template_name, **context)
+    chunks = _chunked(parts, current_app.config.get('STREAM_CHUNK_SIZE', 8192))
+    return Response(chunks, mimetype='text/html')
+
+
+def _choose_encoding():
+    candidates = ['br', 'gzip'] if _load_brotli() else ['gzip']
+    return request.accept_encodings.best_match(candidates)
+
+
+def _compressor(encoding, config):
+    """Retorna (compress(chunk), flush(), finish()) para a codificação escolhida"""
+    if encoding == 'br':
+        brotli = _load_brotli()
+        compressor = brotli.Compressor(quality=config.get('COMPRESS_BR_QUALITY', 4))
+        return compressor.process, compressor.flush, compressor.finish
+
+    # wbits=31 gera o cabeçalho gzip
+    compressor = zlib.compressobj(config.get('COMPRESS_GZIP_LEVEL', 6), zlib.DEFLATED, 31)
+    return (
+        compressor.compress,
+        lambda: compressor.flush(zlib.Z_SYNC_FLUSH),
+        compressor.flush,
+    )
+
+
+def _compress_stream(iterable, compress, flush, finish):
+    """Comprime um corpo em streaming preservando os pontos de flush"""
+    try:
+        for chunk in iterable:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            if chunk:
+                yield compress(chunk) + flush()
+        yield finish()
+    finally:
+        close = getattr(iterable, 'close', None)
+        if close:
+            close()
+
+
+def compress_response(response):
+    config = current_app.config
+    if not config.get('COMPRESS_ENABLED', True):
+        return response
+    if getattr(_current_view(), 'compress', True) is False:
+        return response
+    # send_file: comprimir exigiria ler o arquivo inteiro em memória a cada requisição
+    if response.direct_passthrough or request.path.startswith(current_app.static_url_path + '/'):
+        return response
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return response
+    if 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_TYPES:
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = _choose_encoding()
+    if not encoding:
+        return response
+
+    if not response.is_streamed:
+        length = response.content_length
+        if length is not None and length < config.get('COMPRESS_MIN_SIZE', 500):
+            return response
+        if length is not None and length > config.get('COMPRESS_MAX_SIZE', 4 * 1024 * 1024):
+            return response
+
+    compress, flush, finish = _compressor(encoding, config)
+
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, compress, flush, finish)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < config.get('COMPRESS_MIN_SIZE', 500):
+            return response
+        response.set_data(compress(data) + finish())
+
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_compression(app):
+    app.after_request(compress_response)
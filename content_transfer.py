@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Exportação e importação em massa de posts, planos e configurações
+Executar:
+    python content_transfer.py export posts posts.ndjson [--format csv]
+    python content_transfer.py import posts posts.ndjson [--format csv] [--dry-run]
+
+A exportação lê com cursor no servidor (stream_results), então a memória não
+cresce com o tamanho da tabela. A importação grava em lotes de UPSERT
+multi-linha dentro de uma única transação; com --dry-run só calcula o que
+seria inserido/alterado e desfaz tudo.
+"""
+
+import io
+import os
+import sys
+import csv
+import json
+import argparse
+from datetime import datetime
+
+from sqlalchemy import Boolean, DateTime, Integer, BigInteger, String, select, text
+
+from fragment_cache import fragment_cache
+from utils.sql import upsert_insert
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+class ContentTransfer:
+
+    def __init__(self):
+        self.entities = {}
+
+    def init_app(self, app, db, entities):
+        """entities: {nome: (modelo, coluna_chave, colunas_ignoradas, limpar)}
+
+        limpar(registro) sanitiza o dict no lugar e retorna a mensagem de erro ou
+        None: as mesmas regras dos formulários do admin.
+        """
+        self.app = app
+        self.db = db
+        self.batch_size = app.config.get('TRANSFER_BATCH_SIZE', 1000)
+        for name, (model, key, skip, clean) in entities.items():
+            table = model.__table__
+            columns = [column for column in table.columns if column.name not in skip]
+            self.entities[name] = {'table': table, 'key': key, 'columns': columns, 'clean': clean}
+
+    def entity(self, name):
+        if name not in self.entities:
+            raise ValueError(f"Entidade desconhecida: {name} (use {', '.join(self.entities)})")
+        return self.entities[name]
+
+    # ========================================
+    # EXPORTAÇÃO
+    # ========================================
+
+    def iter_rows(self, name):
+        """Linhas da tabela como dicts, lidas com cursor no servidor"""
+        entity = self.entity(name)
+        table, columns = entity['table'], entity['columns']
+        statement = select(*columns).order_by(table.c[entity['key']])
+        connection = self.db.session.connection().execution_options(
+            stream_results=True, yield_per=self.batch_size
+        )
+        for row in connection.execute(statement):
+            yield {column: _dump_value(value) for column, value in row._mapping.items()}
+
+    def export(self, name, fmt='ndjson'):
+        """Gera o arquivo de exportação em blocos de texto"""
+        if fmt not in FORMATS:
+            raise ValueError(f"Formato desconhecido: {fmt}")
+        rows = self.iter_rows(name)
+        if fmt == 'ndjson':
+            return _batched(json.dumps(row, ensure_ascii=False) + '\n' for row in rows)
+        header = [column.name for column in self.entity(name)['columns']]
+        return _csv_lines(header, rows)
+
+    # ========================================
+    # IMPORTAÇÃO
+    # ========================================
+
+    def parse(self, name, stream, fmt='ndjson'):
+        """Lê o arquivo (binário ou texto) linha a linha, convertendo os tipos"""
+        if fmt not in FORMATS:
+            raise ValueError(f"Formato desconhecido: {fmt}")
+        if not isinstance(stream, io.TextIOBase):
+            stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+        columns = {column.name: column for column in self.entity(name)['columns']}
+
+        if fmt == 'ndjson':
+            records = (json.loads(line) for line in stream if line.strip())
+        else:
+            records = csv.DictReader(stream)
+
+        for number, record in enumerate(records, start=1):
+            try:
+                yield {
+                    key: _load_value(columns[key], value)
+                    for key, value in record.items() if key in columns
+                }
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"Linha {number}: {e}")
+
+    def import_rows(self, name, rows, dry_run=False, sample_size=20):
+        """Aplica os registros em lotes de UPSERT numa única transação.
+
+        Registros que não passam na validação da entidade são pulados e listados
+        em 'erros'. Retorna o relatório {'inserir', 'atualizar', 'inalterados',
+        'rejeitados', 'amostra', 'erros'}; com dry_run a transação é desfeita.
+        """
+        entity = self.entity(name)
+        table, key = entity['table'], entity['key']
+        report = {
+            'entidade': name, 'dry_run': dry_run, 'inserir': 0, 'atualizar': 0, 'inalterados': 0,
+            'rejeitados': 0, 'amostra': [], 'erros': [],
+        }
+        session = self.db.session
+        rows = self._validate(entity, rows, report, sample_size)
+
+        try:
+            for chunk in _chunks(rows, self.batch_size):
+                changed = self._diff(table, key, chunk, report, sample_size)
+                if dry_run:
+                    continue
+                # Um UPSERT por conjunto de colunas: campos ausentes na linha
+                # ficam com o valor atual (ou o default, em registros novos)
+                for columns, group in _group_by_columns(changed).items():
+                    session.execute(self._upsert_statement(table, key, columns), group)
+
+            if dry_run:
+                session.rollback()
+            else:
+                self._reset_sequence(table)
+                refresh_fragments = name in ('planos', 'configuracoes') and report['inserir'] + report['atualizar'] > 0
+                if refresh_fragments:
+                    fragment_cache.bump(session.connection())
+                session.commit()
+                if refresh_fragments:
+                    fragment_cache.invalidate()
+        except Exception:
+            session.rollback()
+            raise
+        return report
+
+    def _validate(self, entity, rows, report, sample_size):
+        """Sanitiza e valida cada registro; os rejeitados só entram no relatório"""
+        clean, key = entity['clean'], entity['key']
+        for number, row in enumerate(rows, start=1):
+            error = clean(row)
+            if error is None:
+                yield row
+                continue
+            report['rejeitados'] += 1
+            if len(report['erros']) < sample_size:
+                report['erros'].append({'linha': number, 'chave': row.get(key), 'erro': error})
+
+    def _diff(self, table, key, chunk, report, sample_size):
+        """Compara o lote com o banco; retorna só os registros novos ou alterados"""
+        keys = [row[key] for row in chunk if row.get(key) is not None]
+        existing = {
+            row._mapping[key]: row._mapping
+            for row in self.db.session.execute(select(table).where(table.c[key].in_(keys)))
+        } if keys else {}
+
+        changed = []
+        for row in chunk:
+            current = existing.get(row.get(key))
+            if current is None:
+                report['inserir'] += 1
+                action, fields = 'inserir', None
+            else:
+                fields = [column for column, value in row.items() if current.get(column) != value]
+                if not fields:
+                    report['inalterados'] += 1
+                    continue
+                report['atualizar'] += 1
+                action = 'atualizar'
+            changed.append(row)
+            if len(report['amostra']) < sample_size:
+                report['amostra'].append({'acao': action, 'chave': row.get(key), 'campos': fields})
+        return changed
+
+    def _upsert_statement(self, table, key, columns):
+        statement = upsert_insert(self.db, table)
+        return statement.on_conflict_do_update(
+            index_elements=[table.c[key]],
+            set_={column: statement.excluded[column] for column in columns if column != key}
+        )
+
+    def _reset_sequence(self, table):
+        """Após inserir ids explícitos a sequence do PostgreSQL precisa acompanhar"""
+        if self.db.engine.dialect.name != 'postgresql' or 'id' not in table.c:
+            return
+        self.db.session.execute(
+            text(f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                 f"COALESCE((SELECT MAX(id) FROM {table.name}), 1))")
+        )
+
+
+def _dump_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _load_value(column, value):
+    if value is None:
+        return None
+    column_type = column.type
+    if value == '':
+        # No CSV vazio e nulo são iguais; em colunas de texto o vazio é um valor
+        return value if isinstance(column_type, String) else None
+    if isinstance(column_type, Boolean):
+        if isinstance(value, bool):
+            return value
+        return str(value).strip().lower() in ('1', 'true', 't', 'sim', 'yes')
+    if isinstance(column_type, (Integer, BigInteger)):
+        return int(value)
+    if isinstance(column_type, DateTime):
+        return value if isinstance(value, datetime) else datetime.fromisoformat(value)
+    return str(value)
+
+
+def _group_by_columns(rows):
+    """{(colunas,): [linhas]} preservando a ordem dentro de cada grupo"""
+    groups = {}
+    for row in rows:
+        groups.setdefault(tuple(row), []).append(row)
+    return groups
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _batched(lines, size=256):
+    """Agrupa linhas para não enviar um pedaço de resposta por registro"""
+    for chunk in _chunks(lines, size):
+        yield ''.join(chunk)
+
+
+def _csv_lines(header, rows, size=256):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=header, lineterminator='\n')
+    writer.writeheader()
+    for count, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if count % size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+content_transfer = ContentTransfer()
+
+
+if __name__ == '__main__':
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from app import app
+
+    parser = argparse.ArgumentParser(description='Exporta/importa posts, planos e configurações')
+    parser.add_argument('comando', choices=['export', 'import'])
+    parser.add_argument('entidade', choices=['posts', 'planos', 'configuracoes'])
+    parser.add_argument('arquivo')
+    parser.add_argument('--format', choices=sorted(FORMATS), help='padrão: pela extensão do arquivo')
+    parser.add_argument('--dry-run', action='store_true', help='só mostra as diferenças (import)')
+    args = parser.parse_args()
+    fmt = args.format or ('csv' if args.arquivo.endswith('.csv') else 'ndjson')
+
+    with app.app_context():
+        if args.comando == 'export':
+            with open(args.arquivo, 'w', encoding='utf-8', newline='') as output:
+                for chunk in content_transfer.export(args.entidade, fmt):
+                    output.write(chunk)
+            print(f"✅ {args.entidade} exportado para {args.arquivo}")
+        else:
+            with open(args.arquivo, 'rb') as source:
+                report = content_transfer.import_rows(
+                    args.entidade, content_transfer.parse(args.entidade, source, fmt), dry_run=args.dry_run
+                )
+            print(f"{'🔍 SIMULAÇÃO' if args.dry_run else '✅ IMPORTADO'}: {args.entidade}")
+            print(f"   Inserir: {report['inserir']} | Atualizar: {report['atualizar']} | "
+                  f"Inalterados: {report['inalterados']} | Rejeitados: {report['rejeitados']}")
+            for item in report['amostra']:
+                campos = f" ({', '.join(item['campos'])})" if item['campos'] else ''
+                print(f"   - {item['acao']} {item['chave']}{campos}")
+            for item in report['erros']:
+                print(f"   ⚠️ linha {item['linha']} ({item['chave']}): {item['erro']}")
@@ -0,0 +1,83 @@
+"""
+Consultas agregadas do painel administrativo
+
+Os totais saem de um GROUP BY (ou de um único SELECT com agregações) em vez
+de carregar as listas completas para contar nos templates.
+"""
+
+from sqlalchemy import case, func, literal
+
+
+class AdminDashboard:
+
+    def init_app(self, db, post_model, plano_model, upload_model):
+        self.db = db
+        self.Post = post_model
+        self.Plano = plano_model
+        self.Upload = upload_model
+
+    def post_stats(self):
+        """Posts por status e categoria: {'total', 'ativos', 'inativos', 'por_categoria'}
+
+        por_categoria conta só os posts ativos, a mesma base das listagens.
+        """
+        Post = self.Post
+        rows = (
+            self.db.session.query(Post.categoria, Post.ativo, func.count(Post.id))
+            .group_by(Post.categoria, Post.ativo)
+            .all()
+        )
+        stats = {'total': 0, 'ativos': 0, 'inativos': 0, 'por_categoria': {}}
+        for categoria, ativo, total in rows:
+            stats['total'] += total
+            stats['ativos' if ativo else 'inativos'] += total
+            if ativo:
+                stats['por_categoria'][categoria] = stats['por_categoria'].get(categoria, 0) + total
+        return stats
+
+    def plano_stats(self):
+        """Planos: {'total', 'ativos', 'inativos', 'recomendados'} em uma consulta
+
+        recomendados conta só os planos ativos, a mesma base das listagens.
+        """
+        Plano = self.Plano
+        total, ativos, recomendados = self.db.session.query(
+            func.count(Plano.id),
+            func.coalesce(func.sum(case((Plano.ativo == True, 1), else_=0)), 0),
+            func.coalesce(func.sum(case(((Plano.ativo == True) & (Plano.recomendado == True), 1), else_=0)), 0),
+        ).one()
+        return {'total': total, 'ativos': int(ativos), 'inativos': total - int(ativos),
+                'recomendados': int(recomendados)}
+
+    def storage_stats(self):
+        """Uso do armazenamento de uploads por backend: {'local': {'arquivos', 'bytes'}, ...}"""
+        Upload = self.Upload
+        rows = (
+            self.db.session.query(Upload.storage_type, func.count(Upload.id), func.coalesce(func.sum(Upload.tamanho), 0))
+            .group_by(Upload.storage_type)
+            .all()
+        )
+        return {storage_type: {'arquivos': count, 'bytes': int(size)} for storage_type, count, size in rows}
+
+    def recent_activity(self, limit=10):
+        """Últimas alterações em posts e planos: [{'tipo', 'id', 'titulo', 'quando'}]"""
+        Post, Plano = self.Post, self.Plano
+        post_quando = func.coalesce(Post.updated_at, Post.created_at)
+        plano_quando = func.coalesce(Plano.updated_at, Plano.created_at)
+        posts = self.db.session.query(
+            literal('post').label('tipo'), Post.id.label('id'), Post.titulo.label('titulo'), post_quando.label('quando')
+        )
+        planos = self.db.session.query(
+            literal('plano').label('tipo'), Plano.id.label('id'), Plano.nome.label('titulo'), plano_quando.label('quando')
+        )
+        atividade = posts.union_all(planos).subquery()
+        rows = (
+            self.db.session.query(atividade)
+            .order_by(atividade.c.quando.desc())
+            .limit(limit)
+            .all()
+        )
+        return [dict(row._mapping) for row in rows]
+
+
+dashboard = AdminDashboard()
@@ -0,0 +1,277 @@
+"""
+Modo degradado: conteúdo público servido de um snapshot quando o banco falha
+
+Cada worker mantém um snapshot em disco (configurações, planos ativos e posts
+recentes), atualizado em background a cada DEGRADED_SNAPSHOT_INTERVAL
+segundos. As rotas públicas leem o banco via fetch(): as consultas rodam com
+statement_timeout (SET LOCAL, só no PostgreSQL; o prazo de cada rota vem do
+@db_deadline) e, se falharem ou estourarem o prazo, a resposta sai do
+snapshot. Conexões abertas por essas requisições usam o mesmo prazo como
+connect_timeout; admin, importação e migrações mantêm os timeouts do engine.
+Depois de CIRCUIT_BREAKER_FAILURES falhas seguidas o circuito abre e o banco nem é consultado por
+CIRCUIT_BREAKER_RESET segundos; então uma única requisição testa o banco de
+novo (o /health também respeita o circuito). Respostas degradadas levam o
+header X-Degraded-Mode.
+"""
+
+import os
+import json
+import time
+import threading
+from datetime import datetime
+
+from flask import g, has_request_context, request, current_app
+from sqlalchemy import DateTime, event, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from logging_setup import get_logger
+from utils.background import ProcessThread
+
+logger = get_logger('degraded_mode')
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = 'fechado', 'aberto', 'meio-aberto'
+
+    def __init__(self, failure_threshold=3, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def is_open(self):
+        """Aberto e ainda dentro do prazo de espera (não consome o teste)"""
+        return self.state == self.OPEN and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def allow(self):
+        """Pode consultar o banco? No meio-aberto só uma requisição testa"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def release_probe(self):
+        """Libera o teste do meio-aberto sem contar sucesso nem falha"""
+        with self._lock:
+            self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("Banco de dados respondendo de novo, saindo do modo degradado")
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.error(f"Circuito do banco aberto após {self.failures} falhas, servindo do snapshot")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class DegradedMode:
+
+    def __init__(self):
+        self.app = None
+        self.breaker = CircuitBreaker()
+        self.sources = {}
+        self.degraded_responses = 0
+        self._snapshot = {}
+        self._snapshot_mtime = None
+        self._lock = threading.Lock()
+        self._worker = ProcessThread('degraded-snapshot', self._run)
+
+    def init_app(self, app, db, sources):
+        """sources: {nome: (modelo ou None, função que consulta o banco)}"""
+        self.app = app
+        self.db = db
+        self.sources = sources
+        self.path = app.config.get('DEGRADED_SNAPSHOT_PATH') or os.path.join(app.instance_path, 'snapshot.json')
+        self.interval = app.config.get('DEGRADED_SNAPSHOT_INTERVAL', 60)
+        self.statement_timeout = app.config.get('DB_STATEMENT_TIMEOUT_MS', 2000)
+        self.breaker = CircuitBreaker(
+            app.config.get('CIRCUIT_BREAKER_FAILURES', 3),
+            app.config.get('CIRCUIT_BREAKER_RESET', 30),
+        )
+
+        with app.app_context():
+            event.listen(db.engine, 'do_connect', self._connect_deadline)
+
+        @app.after_request
+        def _degraded_header(response):
+            if g.get('degraded_mode'):
+                response.headers['X-Degraded-Mode'] = 'snapshot'
+            return response
+
+    # ========================================
+    # CONSULTAS COM FALLBACK
+    # ========================================
+
+    def fetch(self, name, loader=None, fallback=None):
+        """Resultado do banco ou, se ele falhar/estiver fora, do snapshot (ou de fallback())"""
+        self._worker.ensure_started()
+        loader = loader or self.sources[name][1]
+        fallback = fallback or (lambda: self._from_snapshot(name))
+        if not self.breaker.allow():
+            return fallback()
+        try:
+            self.apply_deadline()
+            result = loader()
+        except SQLAlchemyError as e:
+            self.db.session.rollback()
+            g.pop('db_deadline_set', None)
+            self.breaker.record_failure()
+            logger.warning(f"Falha ao consultar {name}, usando snapshot: {e}")
+            return fallback()
+        except Exception:
+            # Erro fora do banco: não diz nada sobre o circuito, só libera o teste
+            self.db.session.rollback()
+            g.pop('db_deadline_set', None)
+            self.breaker.release_probe()
+            raise
+        self.breaker.record_success()
+        return result
+
+    def apply_deadline(self):
+        """SET LOCAL statement_timeout uma vez por transação da requisição"""
+        if g.get('db_deadline_set'):
+            return
+        view = current_app.view_functions.get(request.endpoint) if request.endpoint else None
+        timeout = int(getattr(view, 'db_deadline', self.statement_timeout))
+        # Lido por _connect_deadline se a consulta abaixo precisar abrir conexão
+        g.db_deadline_ms = timeout
+        if self.db.engine.dialect.name == 'postgresql':
+            self.db.session.execute(text(f'SET LOCAL statement_timeout = {timeout}'))
+        g.db_deadline_set = True
+
+    def _connect_deadline(self, dialect, connection_record, cargs, cparams):
+        """do_connect: nas requisições com prazo o connect_timeout também segue o prazo
+        (em segundos inteiros; o libpq não aceita menos de 2)"""
+        if 'connect_timeout' not in cparams or not has_request_context():
+            return
+        timeout_ms = g.get('db_deadline_ms')
+        if timeout_ms:
+            cparams['connect_timeout'] = min(cparams['connect_timeout'], max(2, -(-timeout_ms // 1000)))
+
+    def _from_snapshot(self, name):
+        if has_request_context():
+            g.degraded_mode = True
+        with self._lock:
+            self.degraded_responses += 1
+        self._reload()
+        model = self.sources[name][0]
+        data = self._snapshot.get(name)
+        if model is None:
+            return data or {}
+        return [_build(model, row) for row in data or []]
+
+    # ========================================
+    # SNAPSHOT EM DISCO
+    # ========================================
+
+    def _run(self):
+        while True:
+            self.refresh()
+            if self._worker.stop_event.wait(self.interval):
+                break
+
+    def _reload(self):
+        """Relê o arquivo se outro worker o atualizou"""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if mtime == self._snapshot_mtime:
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Snapshot ilegível em {self.path}: {e}")
+            return
+        self._snapshot, self._snapshot_mtime = snapshot, mtime
+
+    def refresh(self, force=False):
+        """Grava um novo snapshot (se o arquivo já não tiver sido renovado por outro worker)"""
+        if not force:
+            self._reload()
+            if self._snapshot_mtime and time.time() - self._snapshot_mtime < self.interval * 0.9:
+                return False
+        if self.breaker.is_open():
+            return False
+
+        with self.app.app_context():
+            try:
+                snapshot = {'gerado_em': datetime.utcnow().isoformat()}
+                for name, (model, loader) in self.sources.items():
+                    result = loader()
+                    snapshot[name] = result if model is None else [_dump(model, obj) for obj in result]
+            except Exception as e:
+                self.db.session.rollback()
+                logger.warning(f"Erro ao atualizar snapshot, mantendo o anterior: {e}")
+                return False
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self._snapshot, self._snapshot_mtime = snapshot, os.path.getmtime(self.path)
+        return True
+
+    def stats(self):
+        """Métricas para o /health"""
+        self._reload()
+        age = time.time() - self._snapshot_mtime if self._snapshot_mtime else None
+        return {
+            'ativo': self.breaker.state != CircuitBreaker.CLOSED,
+            'circuito': self.breaker.state,
+            'falhas_seguidas': self.breaker.failures,
+            'respostas_degradadas': self.degraded_responses,
+            'snapshot_gerado_em': self._snapshot.get('gerado_em'),
+            'snapshot_idade_s': round(age, 1) if age is not None else None,
+        }
+
+
+def db_deadline(ms):
+    """Prazo próprio (statement_timeout em ms) para as consultas da rota"""
+    def decorator(view):
+        view.db_deadline = ms
+        return view
+    return decorator
+
+
+def _dump(model, obj):
+    row = {}
+    for column in model.__table__.columns:
+        value = getattr(obj, column.key)
+        row[column.key] = value.isoformat() if isinstance(value, datetime) else value
+    return row
+
+
+def _build(model, row):
+    """Instância transitória (fora da sessão) a partir da linha do snapshot"""
+    values = {}
+    for column in model.__table__.columns:
+        value = row.get(column.key)
+        if value is not None and isinstance(column.type, DateTime):
+            value = datetime.fromisoformat(value)
+        values[column.key] = value
+    return model(**values)
+
+
+degraded_mode = DegradedMode()
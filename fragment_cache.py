@@ -0,0 +1,188 @@
+"""
+Cache de fragmentos Jinja para blocos compartilhados do layout
+
+Uso nos templates:
+
+    {% cache 'rodape' %} ... {% endcache %}
+    {% cache 'navbar', request.endpoint %} ... {% endcache %}
+
+O fragmento é guardado pelo nome + partes extras da chave + versão do conteúdo.
+A versão é um carimbo no banco (tabela versoes_cache), incrementado na mesma
+transação de qualquer alteração em Configuracao ou Plano. Cada worker relê o
+carimbo no máximo a cada FRAGMENT_CACHE_VERSION_TTL segundos, na sessão da
+requisição e com o prazo/circuito do degraded_mode; com o circuito aberto vale
+a última versão lida. Fragmentos renderizados do snapshot ou sem `configs` no
+contexto não são guardados. FRAGMENT_CACHE_TTL é só um limite extra de idade
+dos fragmentos.
+"""
+
+import os
+import time
+import threading
+
+from flask import g, has_request_context
+from jinja2 import nodes, FileSystemBytecodeCache
+from jinja2.ext import Extension
+from markupsafe import Markup
+from sqlalchemy import select
+
+from degraded_mode import degraded_mode
+from utils.sql import upsert_insert
+
+STAMP_NAME = 'fragmentos'
+
+
+class FragmentCache:
+    """Armazena fragmentos renderizados em memória, por processo"""
+
+    def __init__(self, ttl=300, max_entries=500, version_ttl=2):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.version_ttl = version_ttl
+        self.enabled = True
+        self.version = 0
+        self._version_checked_at = None
+        self.db = None
+        self.table = None
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """Descarta os fragmentos deste worker (os demais seguem o carimbo)"""
+        with self._lock:
+            self._entries.clear()
+
+    def bump(self, connection):
+        """Incrementa o carimbo compartilhado dentro da transação da alteração"""
+        table = self.table
+        stmt = upsert_insert(self.db, table).values(nome=STAMP_NAME, versao=1)
+        connection.execute(stmt.on_conflict_do_update(
+            index_elements=[table.c.nome],
+            set_={'versao': table.c.versao + 1}
+        ))
+
+    def current_version(self):
+        """Carimbo do banco, relido no máximo a cada version_ttl segundos por worker"""
+        if self.table is None or not has_request_context():
+            return self.version
+        if 'fragment_cache_version' not in g:
+            now = time.monotonic()
+            checked_at = self._version_checked_at
+            if checked_at is None or now - checked_at >= self.version_ttl:
+                version = self._read_version()
+                if version is not None:
+                    with self._lock:
+                        if version != self.version:
+                            self.version = version
+                            self._entries.clear()
+                        self._version_checked_at = now
+            g.fragment_cache_version = self.version
+        return g.fragment_cache_version
+
+    def _read_version(self):
+        """Lê o carimbo pela sessão da requisição; None mantém a última versão conhecida"""
+        if g.get('degraded_mode'):
+            return None
+        table = self.table
+        return degraded_mode.fetch(
+            STAMP_NAME,
+            lambda: self.db.session.execute(
+                select(table.c.versao).where(table.c.nome == STAMP_NAME)
+            ).scalar() or 0,
+            fallback=lambda: None
+        )
+
+    def get_or_render(self, key, render, store=True):
+        if not self.enabled:
+            return render()
+
+        version = self.current_version()
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == version and entry[1] > now:
+            return entry[2]
+
+        value = render()
+        # Conteúdo do snapshot não pode ficar guardado sob a versão do banco
+        if not store or g.get('degraded_mode'):
+            return value
+        with self._lock:
+            if version == self.version:
+                if len(self._entries) >= self.max_entries:
+                    self._entries.clear()
+                self._entries[key] = (version, now + self.ttl, value)
+        return value
+
+
+fragment_cache = FragmentCache()
+
+
+class FragmentCacheExtension(Extension):
+    """Tag {% cache nome[, partes...] %} ... {% endcache %}"""
+
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        call = self.call_method('_render_cached', [nodes.ContextReference(), nodes.Tuple(key, 'load')])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render_cached(self, context, key, caller):
+        # Os blocos do layout vêm das configurações: sem elas o fragmento sai incompleto
+        store = bool(context.get('configs'))
+        return Markup(fragment_cache.get_or_render(key, caller, store=store))
+
+
+def _watch_models(db, models):
+    """Incrementa o carimbo nas transações que alteram algum dos modelos observados"""
+    from sqlalchemy import event
+
+    @event.listens_for(db.session, 'after_flush')
+    def _mark_changes(session, flush_context):
+        if session.info.get('fragment_cache_dirty'):
+            return
+        for instance in (*session.new, *session.dirty, *session.deleted):
+            if isinstance(instance, models):
+                fragment_cache.bump(session.connection())
+                session.info['fragment_cache_dirty'] = True
+                return
+
+    @event.listens_for(db.session, 'after_commit')
+    def _invalidate(session):
+        if session.info.pop('fragment_cache_dirty', False):
+            fragment_cache.invalidate()
+
+    @event.listens_for(db.session, 'after_rollback')
+    def _discard(session):
+        session.info.pop('fragment_cache_dirty', None)
+
+
+def init_fragment_cache(app, db, models, stamp_model):
+    """Registra a tag {% cache %}, a invalidação por modelo e o cache de bytecode"""
+    fragment_cache.enabled = app.config.get('FRAGMENT_CACHE_ENABLED', True)
+    fragment_cache.ttl = app.config.get('FRAGMENT_CACHE_TTL', 300)
+    fragment_cache.version_ttl = app.config.get('FRAGMENT_CACHE_VERSION_TTL', 2)
+    fragment_cache.db = db
+    fragment_cache.table = stamp_model.__table__
+
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    _watch_models(db, tuple(models))
+
+    # Bytecode compilado em disco: workers novos carregam sem recompilar os templates
+    cache_dir = app.config.get('TEMPLATE_BYTECODE_CACHE_DIR')
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+
+
+def precompile_templates(app):
+    """Compila todos os templates (e grava o bytecode em disco, se configurado)"""
+    compiled = 0
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        app.jinja_env.get_template(name)
+        compiled += 1
+    return compiled
@@ -0,0 +1,78 @@
+"""
+Configuração do Gunicorn (usada pelo start.sh)
+
+Com GUNICORN_PRELOAD=true (padrão) o app é importado e aquecido uma única vez
+no processo master e os workers nascem por fork, compartilhando essas páginas
+de memória (copy-on-write) em vez de cada um importar tudo de novo. Módulos
+pesados usados por poucas rotas (numpy/scipy dos posts relacionados, boto3 do
+R2) continuam sendo importados só quando necessários.
+
+Medir: python bench_startup.py
+"""
+
+import gc
+import importlib
+import os
+
+wsgi_app = 'app:app'
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+timeout = 120
+accesslog = '-'
+errorlog = '-'
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+# Importados no master junto com o app (usados em todas as páginas do blog)
+PRELOAD_MODULES = ('bleach',)
+
+
+def _preload_modules(server):
+    for name in PRELOAD_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            server.log.warning(f"Módulo {name} não pré-carregado: {e}")
+
+
+def when_ready(server):
+    """No master, antes dos forks: templates compilados e bleach carregado"""
+    if not server.cfg.preload_app:
+        return
+    _preload_modules(server)
+    from app import app
+    from fragment_cache import precompile_templates
+
+    compiled = precompile_templates(app)
+    # O que existe até aqui sai da coleta do GC, que assim não escreve nessas
+    # páginas e elas continuam compartilhadas com os workers
+    gc.freeze()
+    server.log.info(f"App pré-carregado no master: {compiled} templates compilados")
+
+
+def post_fork(server, worker):
+    """No worker recém-criado: nada de conexões ou threads herdadas do master"""
+    if not server.cfg.preload_app:
+        return
+    from app import app, db
+    from logging_setup import setup_logging
+
+    # O listener da fila de logs é uma thread e não sobrevive ao fork
+    setup_logging()
+    with app.app_context():
+        # Conexões do pool do master não podem ser usadas por dois processos
+        db.engine.dispose(close=False)
+    # view_counter, degraded_mode e related_posts reiniciam as próprias
+    # threads no primeiro uso (utils.background.ProcessThread)
+
+
+def worker_exit(server, worker):
+    """Grava as visualizações pendentes antes do worker sair"""
+    from view_counter import view_counter
+
+    if view_counter.app is None:
+        return
+    try:
+        view_counter.flush()
+    except Exception as e:
+        server.log.error(f"Erro ao gravar visualizações pendentes do worker {worker.pid}: {e}")
@@ -0,0 +1,225 @@
+"""
+Logging estruturado (JSON lines) sem bloquear as threads de request
+
+Os handlers das rotas apenas enfileiram o registro; uma thread do QueueListener
+faz a escrita em stdout. Quando a fila enche, o registro é descartado e contado
+em vez de segurar o request.
+"""
+
+import os
+import sys
+import copy
+import json
+import time
+import uuid
+import queue
+import atexit
+import random
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+
+LOGGER_NAME = 'netfyber'
+
+_state = {'pid': None, 'listener': None, 'handler': None}
+_lock = threading.Lock()
+
+# Campos extras aceitos via logger.info(..., extra={...})
+EXTRA_FIELDS = (
+    'request_id', 'endpoint', 'method', 'path', 'status',
+    'latency_ms', 'db_ms', 'db_queries', 'event',
+)
+
+
+class JsonFormatter(logging.Formatter):
+    """Formata cada registro como uma linha JSON"""
+
+    def format(self, record):
+        data = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f'.{int(record.msecs):03d}Z',
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'pid': record.process,
+        }
+        for field in EXTRA_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                data[field] = value
+        if record.exc_info:
+            data['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data['exc'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    """Anexa request_id e endpoint do request atual (executa na thread do request)"""
+
+    def filter(self, record):
+        from flask import g, has_request_context, request
+
+        if has_request_context():
+            if getattr(record, 'request_id', None) is None:
+                record.request_id = g.get('request_id')
+            if getattr(record, 'endpoint', None) is None:
+                record.endpoint = request.endpoint
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Descarta parte dos registros marcados com extra={'sample_rate': x}"""
+
+    def filter(self, record):
+        rate = getattr(record, 'sample_rate', None)
+        return rate is None or rate >= 1 or random.random() < rate
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler que nunca espera: com a fila cheia o registro é descartado"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        """Resolve a mensagem e o traceback na thread de origem, mantendo-os separados"""
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging(fmt=None, level=None):
+    """Configura o logger 'netfyber' com fila e listener em background.
+
+    Idempotente por processo: após um fork o listener é recriado no filho.
+    """
+    with _lock:
+        if _state['pid'] == os.getpid():
+            return logging.getLogger(LOGGER_NAME)
+
+        fmt = fmt or os.environ.get('LOG_FORMAT', 'json')
+        level = level or os.environ.get('LOG_LEVEL', 'INFO')
+
+        output = logging.StreamHandler(sys.stdout)
+        if fmt == 'json':
+            output.setFormatter(JsonFormatter())
+        else:
+            output.setFormatter(logging.Formatter('%(message)s'))
+
+        log_queue = queue.Queue(maxsize=int(os.environ.get('LOG_QUEUE_SIZE', 10000)))
+        handler = NonBlockingQueueHandler(log_queue)
+        handler.addFilter(SamplingFilter())
+        handler.addFilter(RequestContextFilter())
+
+        logger = logging.getLogger(LOGGER_NAME)
+        if _state['handler'] is not None:
+            logger.removeHandler(_state['handler'])
+        logger.addHandler(handler)
+        logger.setLevel(level)
+        logger.propagate = False
+
+        listener = QueueListener(log_queue, output, respect_handler_level=True)
+        listener.start()
+
+        _state.update(pid=os.getpid(), listener=listener, handler=handler)
+        return logger
+
+
+def get_logger(name=None):
+    setup_logging()
+    return logging.getLogger(f'{LOGGER_NAME}.{name}' if name else LOGGER_NAME)
+
+
+def dropped_records():
+    handler = _state['handler']
+    return handler.dropped if handler else 0
+
+
+@atexit.register
+def _stop_listener():
+    listener = _state['listener']
+    if listener is not None and _state['pid'] == os.getpid():
+        listener.stop()
+
+
+def init_request_logging(app):
+    """Registra request_id, latência e tempo de banco para cada request.
+
+    Requests são amostrados por LOG_REQUEST_SAMPLE_RATE; os lentos
+    (>= LOG_SLOW_REQUEST_MS) e os com erro 5xx são sempre registrados.
+    """
+    from flask import g, has_request_context, request
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+
+    logger = get_logger('request')
+    sample_rate = app.config.get('LOG_REQUEST_SAMPLE_RATE', 0.1)
+    slow_ms = app.config.get('LOG_SLOW_REQUEST_MS', 1000)
+
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context():
+            conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    @event.listens_for(Engine, 'after_cursor_execute')
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('query_start')
+        if starts and has_request_context():
+            g.db_time = g.get('db_time', 0.0) + time.perf_counter() - starts.pop()
+            g.db_queries = g.get('db_queries', 0) + 1
+
+    @app.before_request
+    def _start_request_timer():
+        g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+        g.request_start = time.perf_counter()
+        g.db_time = 0.0
+        g.db_queries = 0
+
+    def _emit(state, extra):
+        latency_ms = (time.perf_counter() - state.request_start) * 1000
+        extra.update({
+            'latency_ms': round(latency_ms, 1),
+            'db_ms': round(state.get('db_time', 0.0) * 1000, 1),
+            'db_queries': state.get('db_queries', 0),
+        })
+        if latency_ms >= slow_ms:
+            logger.warning('Request lento', extra=extra)
+        elif extra['status'] >= 500:
+            logger.error('Request com erro', extra=extra)
+        else:
+            extra['sample_rate'] = sample_rate
+            logger.info('Request', extra=extra)
+
+    @app.after_request
+    def _log_request(response):
+        if g.get('request_start') is None:
+            return response
+        response.headers['X-Request-ID'] = g.request_id
+
+        extra = {
+            'event': 'request',
+            'request_id': g.request_id,
+            'endpoint': request.endpoint,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+        }
+        state = g._get_current_object()
+        if response.is_streamed:
+            # O corpo ainda vai ser renderizado (e consultar o banco): o
+            # registro sai quando o servidor fecha a resposta, já fora do request
+            response.call_on_close(lambda: _emit(state, extra))
+        else:
+            _emit(state, extra)
+        return response
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Migrações versionadas do banco de dados
+Executar: python migrations.py [upgrade|status]
+
+- upgrade: aplica as migrações pendentes (registradas em schema_migrations).
+  No PostgreSQL os índices são criados com CREATE INDEX CONCURRENTLY, sem
+  bloquear escrita nas tabelas, e um advisory lock impede dois runners
+  simultâneos (ex.: dois deploys).
+- status: lista as migrações aplicadas e pendentes.
+
+Se as consultas das páginas usam os índices é conferido em
+tests/test_query_plans.py (EXPLAIN num PostgreSQL de teste, TEST_DATABASE_URL,
+com o schema criado por estas migrações).
+
+Os modelos em app.py descrevem sempre o schema final (um banco novo sai
+completo do db.create_all()); as migrações levam bancos existentes até ele.
+Por isso toda migração usa DDL explícito: nada aqui pode depender dos modelos,
+senão uma migração antiga mudaria junto com eles.
+"""
+
+import os
+import sys
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import text
+
+from app import app, db
+from logging_setup import get_logger
+
+logger = get_logger('migrations')
+
+ADVISORY_LOCK_ID = 7240316
+LOCK_TIMEOUT = '5s'
+
+
+# ========================================
+# OPERAÇÕES
+# ========================================
+
+def _column_exists(conn, table, column):
+    if conn.dialect.name == 'postgresql':
+        return conn.execute(text(
+            "SELECT 1 FROM information_schema.columns WHERE table_name = :table AND column_name = :column"
+        ), {'table': table, 'column': column}).first() is not None
+    return any(row[1] == column for row in conn.execute(text(f'PRAGMA table_info({table})')))
+
+
+def add_column(table, column, ddl):
+    """ALTER TABLE ... ADD COLUMN, ignorando se a coluna já existir.
+
+    Use apenas colunas anuláveis ou com DEFAULT constante: no PostgreSQL 11+
+    isso é só uma alteração de catálogo, sem reescrever a tabela.
+    """
+    def operation(conn):
+        if _column_exists(conn, table, column):
+            return
+        if conn.dialect.name == 'postgresql':
+            conn.execute(text(f"SET lock_timeout = '{LOCK_TIMEOUT}'"))
+        conn.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {ddl}'))
+    operation.description = f'ADD COLUMN {table}.{column}'
+    return operation
+
+
+def create_index(name, table, columns):
+    """CREATE INDEX (CONCURRENTLY no PostgreSQL), recriando índices inválidos"""
+    def operation(conn):
+        if conn.dialect.name == 'postgresql':
+            # Um CREATE INDEX CONCURRENTLY interrompido deixa um índice inválido para trás
+            invalid = conn.execute(text(
+                "SELECT 1 FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid "
+                "WHERE c.relname = :name AND NOT i.indisvalid"
+            ), {'name': name}).first()
+            if invalid:
+                conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS {name}'))
+            conn.execute(text(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns})'))
+        else:
+            conn.execute(text(f'CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})'))
+    operation.description = f'CREATE INDEX {name} ON {table} ({columns})'
+    return operation
+
+
+def drop_index(name):
+    """DROP INDEX (CONCURRENTLY no PostgreSQL), ignorando se o índice não existir"""
+    def operation(conn):
+        if conn.dialect.name == 'postgresql':
+            conn.execute(text(f"SET lock_timeout = '{LOCK_TIMEOUT}'"))
+            conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS {name}'))
+        else:
+            conn.execute(text(f'DROP INDEX IF EXISTS {name}'))
+    operation.description = f'DROP INDEX {name}'
+    return operation
+
+
+def create_table(table, *columns):
+    """CREATE TABLE IF NOT EXISTS com as colunas em DDL explícito.
+
+    `SERIAL PRIMARY KEY` vira `INTEGER PRIMARY KEY` (rowid) fora do PostgreSQL.
+    """
+    def operation(conn):
+        ddl = ', '.join(columns)
+        if conn.dialect.name != 'postgresql':
+            ddl = ddl.replace('SERIAL PRIMARY KEY', 'INTEGER PRIMARY KEY')
+        conn.execute(text(f'CREATE TABLE IF NOT EXISTS {table} ({ddl})'))
+    operation.description = f'CREATE TABLE {table}'
+    return operation
+
+
+def execute(description, *statements):
+    """Executa DDL/DML explícito (use IF NOT EXISTS / ON CONFLICT para ser reexecutável)"""
+    def operation(conn):
+        for statement in statements:
+            conn.execute(text(statement))
+    operation.description = description
+    return operation
+
+
+# ========================================
+# MIGRAÇÕES (nunca altere uma migração já publicada; adicione uma nova)
+# ========================================
+
+MIGRATIONS = [
+    (1, 'Tabelas iniciais', [
+        create_table(
+            'admin_users',
+            'id SERIAL PRIMARY KEY',
+            'username VARCHAR(80) NOT NULL UNIQUE',
+            'email VARCHAR(120) NOT NULL UNIQUE',
+            'password_hash VARCHAR(512) NOT NULL',
+            'is_active BOOLEAN',
+            'created_at TIMESTAMP',
+            'last_login TIMESTAMP',
+        ),
+        create_table(
+            'configuracoes',
+            'id SERIAL PRIMARY KEY',
+            'chave VARCHAR(100) NOT NULL UNIQUE',
+            'valor TEXT NOT NULL',
+            'descricao VARCHAR(200)',
+            'created_at TIMESTAMP',
+        ),
+        create_table(
+            'planos',
+            'id SERIAL PRIMARY KEY',
+            'nome VARCHAR(100) NOT NULL',
+            'preco VARCHAR(20) NOT NULL',
+            'velocidade VARCHAR(50)',
+            'features TEXT NOT NULL',
+            'recomendado BOOLEAN',
+            'ordem_exibicao INTEGER',
+            'ativo BOOLEAN',
+            'created_at TIMESTAMP',
+        ),
+        create_table(
+            'posts',
+            'id SERIAL PRIMARY KEY',
+            'titulo VARCHAR(200) NOT NULL',
+            'conteudo TEXT NOT NULL',
+            'resumo TEXT NOT NULL',
+            'categoria VARCHAR(50) NOT NULL',
+            'imagem VARCHAR(500)',
+            'link_materia VARCHAR(500) NOT NULL',
+            'data_publicacao TIMESTAMP NOT NULL',
+            'ativo BOOLEAN',
+            'created_at TIMESTAMP',
+        ),
+        create_table(
+            'post_visualizacoes',
+            'post_id INTEGER NOT NULL REFERENCES posts (id) ON DELETE CASCADE',
+            'total BIGINT NOT NULL',
+            'updated_at TIMESTAMP',
+            'PRIMARY KEY (post_id)',
+        ),
+        create_table(
+            'uploads',
+            'id SERIAL PRIMARY KEY',
+            'filename VARCHAR(100) NOT NULL UNIQUE',
+            'sha256 VARCHAR(64) NOT NULL',
+            'storage_type VARCHAR(10) NOT NULL',
+            'content_type VARCHAR(50)',
+            'tamanho INTEGER',
+            'ref_count INTEGER NOT NULL',
+            'created_at TIMESTAMP',
+        ),
+    ]),
+    (2, 'Índices das consultas de planos e posts', [
+        create_index('ix_planos_ativo_ordem', 'planos', 'ativo, ordem_exibicao'),
+        create_index('ix_posts_ativo_data', 'posts', 'ativo, data_publicacao'),
+        create_index('ix_posts_ativo_categoria_data', 'posts', 'ativo, categoria, data_publicacao'),
+        create_index('ix_post_visualizacoes_total', 'post_visualizacoes', 'total'),
+    ]),
+    (3, 'Data de alteração de posts e planos', [
+        add_column('posts', 'updated_at', 'TIMESTAMP'),
+        add_column('planos', 'updated_at', 'TIMESTAMP'),
+    ]),
+    (4, 'Posts relacionados', [
+        execute(
+            'CREATE TABLE posts_relacionados',
+            'CREATE TABLE IF NOT EXISTS posts_relacionados ('
+            'post_id INTEGER NOT NULL REFERENCES posts (id) ON DELETE CASCADE, '
+            'posicao SMALLINT NOT NULL, '
+            'relacionado_id INTEGER NOT NULL REFERENCES posts (id) ON DELETE CASCADE, '
+            'score FLOAT NOT NULL, '
+            'PRIMARY KEY (post_id, posicao))',
+        ),
+        create_index('ix_posts_relacionados_relacionado_id', 'posts_relacionados', 'relacionado_id'),
+    ]),
+    (5, 'Carimbo de versão do cache de fragmentos', [
+        execute(
+            'CREATE TABLE versoes_cache',
+            'CREATE TABLE IF NOT EXISTS versoes_cache ('
+            'nome VARCHAR(50) PRIMARY KEY, '
+            'versao INTEGER NOT NULL DEFAULT 0)',
+            "INSERT INTO versoes_cache (nome, versao) VALUES ('fragmentos', 0) ON CONFLICT DO NOTHING",
+        ),
+    ]),
+    (6, 'Remove índice de posts por categoria sem consultas', [
+        drop_index('ix_posts_ativo_categoria_data'),
+    ]),
+]
+
+
+# ========================================
+# RUNNER
+# ========================================
+
+def _ensure_version_table(conn):
+    conn.execute(text(
+        'CREATE TABLE IF NOT EXISTS schema_migrations ('
+        'version INTEGER PRIMARY KEY, '
+        'name VARCHAR(200) NOT NULL, '
+        'applied_at TIMESTAMP NOT NULL)'
+    ))
+
+
+def applied_versions(conn):
+    _ensure_version_table(conn)
+    return {row[0] for row in conn.execute(text('SELECT version FROM schema_migrations'))}
+
+
+def upgrade(engine=None):
+    """Aplica as migrações pendentes em ordem; retorna as versões aplicadas.
+    
+    engine: outro banco que não o do app (ex.: o PostgreSQL dos testes).
+    """
+    applied = []
+    with app.app_context():
+        engine = engine or db.engine
+        # AUTOCOMMIT: CREATE INDEX CONCURRENTLY não pode rodar dentro de transação
+        with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+            postgres = conn.dialect.name == 'postgresql'
+            if postgres:
+                conn.execute(text('SELECT pg_advisory_lock(:id)'), {'id': ADVISORY_LOCK_ID})
+            try:
+                done = applied_versions(conn)
+                for version, name, operations in MIGRATIONS:
+                    if version in done:
+                        continue
+                    logger.info(f"Aplicando migração {version}: {name}")
+                    for operation in operations:
+                        logger.info(f"  {operation.description}")
+                        operation(conn)
+                    conn.execute(text(
+                        'INSERT INTO schema_migrations (version, name, applied_at) VALUES (:v, :n, :t)'
+                    ), {'v': version, 'n': name, 't': datetime.utcnow()})
+                    applied.append(version)
+            finally:
+                if postgres:
+                    conn.execute(text('SELECT pg_advisory_unlock(:id)'), {'id': ADVISORY_LOCK_ID})
+    return applied
+
+
+def status():
+    with app.app_context():
+        with db.engine.begin() as conn:
+            done = applied_versions(conn)
+    return [(version, name, version in done) for version, name, _ in MIGRATIONS]
+
+
+if __name__ == '__main__':
+    command = sys.argv[1] if len(sys.argv) > 1 else 'upgrade'
+
+    if command == 'upgrade':
+        versions = upgrade()
+        logger.info(f"Migrações aplicadas: {versions}" if versions else "Banco de dados já atualizado")
+    elif command == 'status':
+        for version, name, done in status():
+            print(f"{'[x]' if done else '[ ]'} {version:03d} {name}")
+    else:
+        print(__doc__)
+        sys.exit(2)
@@ -0,0 +1,422 @@
+#!/usr/bin/env python3
+"""
+Posts relacionados ("Veja também") por similaridade TF-IDF
+Executar: python related_posts.py rebuild [--if-empty]
+
+Cada post vira um vetor TF-IDF esparso (título com peso dobrado, resumo,
+conteúdo e categoria, com tokenização em português) e os RELATED_POSTS_K
+vizinhos mais parecidos (cosseno) ficam gravados em posts_relacionados. As
+páginas só consultam essa tabela.
+
+Ao salvar um post o índice é atualizado de forma incremental, em background:
+só o vetor do post muda (com o vocabulário e o IDF da última reconstrução) e
+são recalculados os vizinhos dele e dos posts cuja lista ele entra ou sai.
+Termos novos só passam a contar na próxima reconstrução completa.
+
+numpy/scipy só são importados ao calcular; as páginas (lookup) não precisam deles.
+"""
+
+import os
+import re
+import sys
+import threading
+import time
+import unicodedata
+from collections import Counter
+from datetime import datetime
+from functools import lru_cache
+
+from sqlalchemy import func, or_
+
+from logging_setup import get_logger
+from utils.background import ProcessThread
+
+logger = get_logger('related_posts')
+
+STOPWORDS = frozenset("""
+    a ao aos apos aquela aquelas aquele aqueles aquilo as ate cada com como da das de dela delas dele
+    deles depois do dos e ela elas ele eles em entre era eram essa essas esse esses esta estao estas
+    este estes eu foi foram ha isso isto ja la lhe lhes mais mas me mesmo meu minha muito na nao nas
+    nem no nos nossa nosso num numa o onde os ou outra outras outro outros para pela pelas pelo pelos
+    pode podem por qual quando que quem sao se sem ser seu seus so sobre sua suas tambem te tem ter
+    toda todas todo todos teu tua um uma umas uns vai vao voce voces
+""".split())
+
+_TAG_RE = re.compile(r'<[^>]+>')
+_TOKEN_RE = re.compile(r'[a-z0-9]{3,}')
+_PLURAL_SUFFIXES = (
+    ('oes', 'ao'), ('aes', 'ao'), ('ais', 'al'), ('eis', 'el'), ('ois', 'ol'), ('res', 'r'), ('zes', 'z'), ('ns', 'm'),
+)
+
+
+@lru_cache(maxsize=100000)
+def _stem(word):
+    """Reduz plurais comuns (conexões -> conexao, roteadores -> roteador, redes -> rede)"""
+    if len(word) > 5:
+        for suffix, replacement in _PLURAL_SUFFIXES:
+            if word.endswith(suffix):
+                return word[:-len(suffix)] + replacement
+    if len(word) > 4 and word.endswith('s') and not word.endswith('ss'):
+        return word[:-1]
+    return word
+
+
+def tokenize(text):
+    """Palavras sem acento, sem HTML e sem stopwords, com plural reduzido"""
+    text = unicodedata.normalize('NFKD', _TAG_RE.sub(' ', text or '').lower())
+    text = text.encode('ascii', 'ignore').decode('ascii')
+    return [_stem(token) for token in _TOKEN_RE.findall(text) if token not in STOPWORDS]
+
+
+def document_terms(titulo, resumo, conteudo, categoria):
+    terms = Counter(tokenize(titulo))
+    for term in terms:
+        terms[term] *= 2
+    terms.update(tokenize(resumo))
+    terms.update(tokenize(conteudo))
+    if categoria:
+        terms[f'categoria:{categoria}'] += 1
+    return terms
+
+
+class RelatedPosts:
+
+    def __init__(self):
+        self.app = None
+        self.k = 4
+        self.max_df = 0.05
+        self.max_terms = 20
+        self.block_size = 512
+        self._matrix = None
+        self._synced_at = None
+        self._pending = set()
+        self._rebuild_requested = False
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker = ProcessThread('related-posts', self._run, on_start=self._reset)
+
+    def init_app(self, app, db, post_model, model):
+        self.app = app
+        self.db = db
+        self.Post = post_model
+        self.model = model
+        self.k = app.config.get('RELATED_POSTS_K', 4)
+        self.max_df = app.config.get('RELATED_POSTS_MAX_DF', 0.05)
+        self.max_terms = app.config.get('RELATED_POSTS_MAX_TERMS', 20)
+
+    # ========================================
+    # VETORIZAÇÃO
+    # ========================================
+
+    def _iter_documents(self, since=None, ids=()):
+        Post = self.Post
+        query = self.db.session.query(Post.id, Post.titulo, Post.resumo, Post.conteudo, Post.categoria)
+        query = query.filter(Post.ativo == True)
+        if since is not None or ids:
+            query = query.filter(or_(Post.updated_at > since, Post.id.in_(list(ids))))
+        for row in query.execution_options(yield_per=1000):
+            yield row.id, document_terms(row.titulo, row.resumo, row.conteudo, row.categoria)
+
+    def _counts(self, documents, grow_vocab):
+        """Matriz esparsa de contagens (posts x termos) e os ids na ordem das linhas"""
+        import numpy as np
+        from scipy import sparse
+
+        ids, indptr, indices, counts = [], [0], [], []
+        vocab = self._vocab
+        for post_id, terms in documents:
+            ids.append(post_id)
+            for term, count in terms.items():
+                column = vocab.setdefault(term, len(vocab)) if grow_vocab else vocab.get(term)
+                if column is not None:
+                    indices.append(column)
+                    counts.append(count)
+            indptr.append(len(indices))
+        matrix = sparse.csr_matrix(
+            (np.asarray(counts, dtype=np.float32), np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int64)),
+            shape=(len(ids), len(vocab))
+        )
+        return ids, matrix
+
+    def _weigh(self, counts):
+        """TF sublinear x IDF, linhas normalizadas (produto escalar = cosseno)"""
+        import numpy as np
+        from scipy import sparse
+
+        matrix = counts.copy()
+        matrix.data = 1 + np.log(matrix.data)
+        matrix = sparse.csr_matrix(matrix.multiply(self._idf))
+        if self.max_terms:
+            self._keep_top_terms(matrix)
+        matrix.eliminate_zeros()
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        return sparse.csr_matrix(sparse.diags(1 / norms) @ matrix, dtype=np.float32)
+
+    def _keep_top_terms(self, matrix):
+        """Zera tudo menos os max_terms termos de maior peso de cada post.
+
+        O custo do produto X @ X.T cresce com o quadrado da frequência de cada
+        termo; os termos de peso baixo quase não mudam o cosseno, mas são
+        eles que aparecem em milhares de posts.
+        """
+        import numpy as np
+
+        for row in range(matrix.shape[0]):
+            lo, hi = matrix.indptr[row], matrix.indptr[row + 1]
+            if hi - lo > self.max_terms:
+                data = matrix.data[lo:hi]
+                data[np.argpartition(data, hi - lo - self.max_terms)[:hi - lo - self.max_terms]] = 0
+
+    def _fit(self):
+        """Vetoriza todos os posts ativos, recalculando vocabulário e IDF"""
+        import numpy as np
+
+        self._synced_at = datetime.utcnow()
+        self._vocab = {}
+        ids, counts = self._counts(self._iter_documents(), grow_vocab=True)
+        n = len(ids)
+        df = np.bincount(counts.indices, minlength=counts.shape[1])
+        self._idf = (np.log((1 + n) / (1 + df)) + 1).astype(np.float32)
+        # Termos presentes em boa parte dos posts não distinguem nada e deixam o produto denso
+        self._idf[df > max(self.max_df * n, 100)] = 0
+        self._ids = np.asarray(ids, dtype=np.int64)
+        self._rows = {post_id: row for row, post_id in enumerate(ids)}
+        self._matrix = self._weigh(counts)
+        self._kth = np.zeros(n, dtype=np.float32)
+
+    def _load_kth(self):
+        """Menor score das listas gravadas: sem isso, depois de um _fit() todo post
+        com alguma semelhança ao alterado pareceria ganhar lugar na lista"""
+        model = self.model
+        rows = (
+            self.db.session.query(model.post_id, func.min(model.score))
+            .group_by(model.post_id)
+            .having(func.count() >= self.k)
+        )
+        for post_id, score in rows:
+            row = self._rows.get(post_id)
+            if row is not None:
+                self._kth[row] = score
+
+    # ========================================
+    # VIZINHOS
+    # ========================================
+
+    def _neighbours(self, rows):
+        """{linha: [(linha_vizinha, score)]} com os k mais parecidos, em blocos"""
+        import numpy as np
+
+        results = {}
+        transposed = self._matrix.T.tocsr()
+        for start in range(0, len(rows), self.block_size):
+            block = rows[start:start + self.block_size]
+            sims = (self._matrix[block] @ transposed).tocsr()
+            for i, row in enumerate(block):
+                lo, hi = sims.indptr[i], sims.indptr[i + 1]
+                columns, scores = sims.indices[lo:hi], sims.data[lo:hi]
+                keep = (columns != row) & (scores > 0)
+                columns, scores = columns[keep], scores[keep]
+                if len(scores) > self.k:
+                    top = np.argpartition(-scores, self.k)[:self.k]
+                    columns, scores = columns[top], scores[top]
+                order = np.argsort(-scores)
+                results[row] = list(zip(columns[order].tolist(), scores[order].tolist()))
+                self._kth[row] = scores.min() if len(scores) >= self.k else 0
+        return results
+
+    def _write(self, results, cleared_ids):
+        """Substitui as listas dos posts informados (sem commit)"""
+        table = self.model.__table__
+        Post = self.Post
+        owner_ids = [int(self._ids[row]) for row in results] + list(cleared_ids)
+        neighbour_ids = {int(self._ids[column]) for pairs in results.values() for column, _ in pairs}
+
+        # Posts excluídos por outro worker ainda podem estar na matriz deste
+        valid = set()
+        neighbour_list = list(neighbour_ids)
+        for start in range(0, len(neighbour_list), 1000):
+            chunk = neighbour_list[start:start + 1000]
+            valid.update(post_id for (post_id,) in self.db.session.query(Post.id).filter(Post.id.in_(chunk), Post.ativo == True))
+
+        for start in range(0, len(owner_ids), 1000):
+            self.db.session.execute(table.delete().where(table.c.post_id.in_(owner_ids[start:start + 1000])))
+
+        values = []
+        for row, pairs in results.items():
+            position = 0
+            for column, score in pairs:
+                neighbour_id = int(self._ids[column])
+                if neighbour_id in valid:
+                    values.append({'post_id': int(self._ids[row]), 'posicao': position,
+                                   'relacionado_id': neighbour_id, 'score': float(score)})
+                    position += 1
+        for start in range(0, len(values), 5000):
+            self.db.session.execute(table.insert(), values[start:start + 5000])
+        return len(values)
+
+    # ========================================
+    # RECONSTRUÇÃO E ATUALIZAÇÃO
+    # ========================================
+
+    def rebuild(self):
+        """Recalcula todos os vetores e vizinhos; retorna o número de posts indexados"""
+        try:
+            self._fit()
+            results = self._neighbours(list(range(len(self._ids))))
+            self.db.session.execute(self.model.__table__.delete())
+            self._write(results, ())
+            self.db.session.commit()
+        except Exception:
+            self.db.session.rollback()
+            self._matrix = None
+            raise
+        return len(self._ids)
+
+    def update(self, post_ids=()):
+        """Atualiza os vetores dos posts alterados desde a última sincronização"""
+        import numpy as np
+        from scipy import sparse
+
+        if self._matrix is None:
+            self._fit()
+            self._load_kth()
+        Post = self.Post
+        started = datetime.utcnow()
+        post_ids = set(post_ids)
+
+        ids, counts = self._counts(self._iter_documents(self._synced_at, post_ids), grow_vocab=False)
+        vectors = self._weigh(counts)
+        inactive = {
+            post_id for (post_id,) in self.db.session.query(Post.id)
+            .filter(Post.ativo == False, Post.updated_at > self._synced_at)
+        }
+        removed = ((post_ids - set(ids)) | inactive) & set(self._rows)
+        removed_ids = (post_ids - set(ids)) | inactive
+
+        # Linhas alteradas e removidas são zeradas; posts novos entram no fim
+        n = len(self._ids)
+        keep = np.ones(n, dtype=np.float32)
+        keep[[self._rows[post_id] for post_id in removed | (set(ids) & set(self._rows))]] = 0
+        new_ids = [post_id for post_id in ids if post_id not in self._rows]
+        self._rows.update((post_id, n + i) for i, post_id in enumerate(new_ids))
+        self._ids = np.concatenate([self._ids, np.asarray(new_ids, dtype=np.int64)])
+        self._kth = np.append(self._kth, np.zeros(len(new_ids), dtype=np.float32))
+        changed_rows = [self._rows[post_id] for post_id in ids]
+
+        matrix = sparse.diags(keep) @ self._matrix
+        matrix = sparse.vstack([matrix, sparse.csr_matrix((len(new_ids), matrix.shape[1]), dtype=np.float32)])
+        placement = sparse.csr_matrix(
+            (np.ones(len(ids), dtype=np.float32), (changed_rows, np.arange(len(ids)))),
+            shape=(len(self._ids), len(ids))
+        )
+        self._matrix = sparse.csr_matrix(matrix + placement @ vectors, dtype=np.float32)
+
+        # Afetados: quem tinha um dos alterados na lista e quem passa a tê-lo entre os k melhores
+        touched = set(ids) | removed_ids
+        affected = set(changed_rows)
+        if touched:
+            holders = self.db.session.query(self.model.post_id).filter(self.model.relacionado_id.in_(list(touched)))
+            affected.update(self._rows[post_id] for (post_id,) in holders if post_id in self._rows)
+        if changed_rows:
+            sims = (self._matrix[changed_rows] @ self._matrix.T).tocsr()
+            candidates = sims.indices[sims.data > self._kth[sims.indices]]
+            affected.update(candidates.tolist())
+        affected -= {self._rows[post_id] for post_id in removed}
+
+        try:
+            results = self._neighbours(sorted(affected))
+            written = self._write(results, removed_ids)
+            self.db.session.commit()
+        except Exception:
+            self.db.session.rollback()
+            raise
+        self._synced_at = started
+        logger.info(f"Posts relacionados atualizados: {len(ids)} alterados, {len(removed_ids)} removidos, "
+                    f"{len(results)} listas recalculadas ({written} vizinhos)")
+
+    # ========================================
+    # ATUALIZAÇÃO EM BACKGROUND
+    # ========================================
+
+    def schedule(self, post_id=None):
+        """Agenda a atualização do post (None: reconstrução completa)"""
+        self._worker.ensure_started()
+        with self._lock:
+            if post_id is None:
+                self._rebuild_requested = True
+            else:
+                self._pending.add(post_id)
+        self._wakeup.set()
+
+    def _reset(self):
+        # Índice e pendências herdados do processo pai pertencem a ele
+        self._matrix = None
+        self._pending = set()
+        self._rebuild_requested = False
+        self._wakeup = threading.Event()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            # Junta os saves em sequência (ex.: várias edições seguidas) numa atualização
+            self._wakeup.clear()
+            time.sleep(1)
+            with self._lock:
+                pending, self._pending = self._pending, set()
+                rebuild, self._rebuild_requested = self._rebuild_requested, False
+            with self.app.app_context():
+                try:
+                    if rebuild:
+                        self.rebuild()
+                    elif pending:
+                        self.update(pending)
+                except Exception as e:
+                    self._matrix = None
+                    logger.exception(f"Erro ao atualizar posts relacionados: {e}")
+
+    # ========================================
+    # CONSULTA
+    # ========================================
+
+    def lookup(self, post_ids):
+        """{post_id: [Post]} com os relacionados ativos de cada post, numa consulta"""
+        post_ids = list(post_ids)
+        if not post_ids:
+            return {}
+        from sqlalchemy.orm import load_only
+
+        Post, model = self.Post, self.model
+        rows = (
+            self.db.session.query(model.post_id, Post)
+            .join(Post, Post.id == model.relacionado_id)
+            .filter(model.post_id.in_(post_ids), Post.ativo == True)
+            .options(load_only(Post.id, Post.titulo, Post.categoria))
+            .order_by(model.post_id, model.posicao)
+        )
+        related = {}
+        for post_id, post in rows:
+            related.setdefault(post_id, []).append(post)
+        return related
+
+
+related_posts = RelatedPosts()
+
+
+if __name__ == '__main__':
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    from app import app, PostRelacionado
+
+    command = sys.argv[1] if len(sys.argv) > 1 else 'rebuild'
+    if command != 'rebuild':
+        print(__doc__)
+        sys.exit(2)
+
+    with app.app_context():
+        if '--if-empty' in sys.argv and PostRelacionado.query.first() is not None:
+            logger.info("Posts relacionados já calculados")
+            sys.exit(0)
+        started = datetime.utcnow()
+        total = related_posts.rebuild()
+        elapsed = (datetime.utcnow() - started).total_seconds()
+        logger.info(f"Posts relacionados recalculados: {total} posts em {elapsed:.1f}s")
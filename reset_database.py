@@ -3,24 +3,27 @@ import os
 import sys
 from app import app, db
 from app import AdminUser, Plano, Configuracao, Post
+from logging_setup import get_logger
 from werkzeug.security import generate_password_hash
 from datetime import datetime
 
+logger = get_logger('reset_database')
+
 def reset_database():
-    print("🚀 Iniciando reset do banco de dados...")
+    logger.info("Iniciando reset do banco de dados...")
     
     with app.app_context():
         try:
             # Remover todas as tabelas
-            print("📦 Removendo tabelas antigas...")
+            logger.info("Removendo tabelas antigas...")
             db.drop_all()
             
             # Criar todas as tabelas
-            print("🔄 Criando novas tabelas...")
+            logger.info("Criando novas tabelas...")
             db.create_all()
             
             # Criar usuário admin padrão
-            print("👤 Criando usuário admin...")
+            logger.info("Criando usuário admin...")
             admin_username = os.environ.get('ADMIN_USERNAME', 'admin')
             admin_password = os.environ.get('ADMIN_PASSWORD', 'Teste123!')
             admin_email = os.environ.get('ADMIN_EMAIL', 'admin@netfyber.com')
@@ -35,7 +38,7 @@ def reset_database():
             db.session.add(admin)
             
             # Criar configurações padrão
-            print("⚙️ Criando configurações padrão...")
+            logger.info("Criando configurações padrão...")
             configs = [
                 Configuracao(chave='telefone_contato', valor='(63) 8494-1778'),
                 Configuracao(chave='email_contato', valor='contato@netfyber.com'),
@@ -53,7 +56,7 @@ def reset_database():
                 db.session.add(config)
             
             # Criar planos de exemplo
-            print("📊 Criando planos de exemplo...")
+            logger.info("Criando planos de exemplo...")
             planos = [
                 Plano(
                     nome='100 MEGA',
@@ -88,7 +91,7 @@ def reset_database():
                 db.session.add(plano)
             
             # Criar posts de exemplo
-            print("📝 Criando posts de exemplo...")
+            logger.info("Criando posts de exemplo...")
             posts = [
                 Post(
                     titulo='A importância da internet de alta velocidade',
@@ -117,17 +120,17 @@ def reset_database():
             
             # Salvar tudo
             db.session.commit()
-            print("✅ Banco de dados resetado com sucesso!")
-            print(f"📋 Credenciais de acesso:")
+            logger.info("Banco de dados resetado com sucesso!")
+            logger.info(f"Usuário admin criado: {admin_username}")
+            # Credenciais só no terminal de quem executou o script, nunca no log estruturado
+            print("📋 Credenciais de acesso:")
             print(f"   Usuário: {admin_username}")
             print(f"   Senha: {admin_password}")
             print(f"   Email: {admin_email}")
-            print(f"🔗 Acesse: /gestao-exclusiva-netfyber/login")
+            print("🔗 Acesse: /gestao-exclusiva-netfyber/login")
             
         except Exception as e:
-            print(f"❌ Erro ao resetar banco: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"Erro ao resetar banco: {e}")
             db.session.rollback()
 
 if __name__ == '__main__':
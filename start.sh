@@ -12,11 +12,11 @@ mkdir -p static/images
 # Instalar dependências específicas se necessário
 pip install psycopg2-binary --no-cache-dir
 
-# Executar a aplicação com Gunicorn
-exec gunicorn app:app \
-    --bind 0.0.0.0:$PORT \
-    --workers=2 \
-    --threads=4 \
-    --timeout=120 \
-    --access-logfile - \
-    --error-logfile -
\ No newline at end of file
+# Aplicar migrações pendentes (índices são criados sem bloquear o site)
+python migrations.py upgrade
+
+# Calcular os posts relacionados na primeira vez (depois são atualizados a cada post salvo)
+python related_posts.py rebuild --if-empty
+
+# Executar a aplicação com Gunicorn (workers, threads e preload em gunicorn.conf.py)
+exec gunicorn -c gunicorn.conf.py
\ No newline at end of file
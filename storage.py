@@ -1,104 +1,342 @@
 import os
-import uuid
-from werkzeug.utils import secure_filename
-from flask import current_app
+import hashlib
+import tempfile
+from flask import current_app, Request
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge, UnsupportedMediaType
+
+from logging_setup import get_logger
+
+logger = get_logger('storage')
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
 
+CONTENT_TYPES = {
+    'png': 'image/png',
+    'jpg': 'image/jpeg',
+    'gif': 'image/gif',
+    'webp': 'image/webp',
+}
+
+# Bytes necessários para reconhecer todas as assinaturas (WEBP usa 12)
+SNIFF_SIZE = 12
+CHUNK_SIZE = 64 * 1024
+
 def allowed_file(filename):
     """Verifica se o arquivo tem uma extensão permitida"""
     if not filename:
         return False
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-def save_file_local(file):
-    """Salva o arquivo localmente no sistema de arquivos"""
-    if not allowed_file(file.filename):
-        return None
+def sniff_image_type(head):
+    """Identifica o tipo da imagem pelos magic bytes; retorna a extensão ou None"""
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'jpg'
+    if head.startswith((b'GIF87a', b'GIF89a')):
+        return 'gif'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+class HashingUploadStream:
+    """Arquivo temporário que valida e calcula o SHA-256 do upload enquanto ele é recebido.
     
-    try:
-        filename = f"{uuid.uuid4().hex}.{file.filename.rsplit('.', 1)[1].lower()}"
-        upload_folder = current_app.config['UPLOAD_FOLDER']
-        os.makedirs(upload_folder, exist_ok=True)
-        file_path = os.path.join(upload_folder, filename)
-        file.save(file_path)
-        
-        if os.path.exists(file_path) and os.path.getsize(file_path) > 0:
-            return {
-                'filename': filename,
-                'storage_type': 'local',
-                'url': f"/static/uploads/blog/{filename}"
-            }
-    except Exception as e:
-        print(f"Erro ao salvar arquivo localmente: {e}")
-        if 'file_path' in locals() and os.path.exists(file_path):
-            os.remove(file_path)
+    Os primeiros bytes são conferidos contra as assinaturas de imagem e o upload é
+    rejeitado antes de ser lido por completo. O arquivo fica na própria pasta de
+    uploads, então promovê-lo ao nome definitivo é apenas um os.replace.
+    """
     
-    return None
+    def __init__(self, directory, max_size=None):
+        os.makedirs(directory, exist_ok=True)
+        fd, self.temp_path = tempfile.mkstemp(prefix='.upload-', suffix='.tmp', dir=directory)
+        self._file = os.fdopen(fd, 'w+b')
+        self._hash = hashlib.sha256()
+        self._head = b''
+        self.extension = None
+        self.size = 0
+        self.max_size = max_size
+    
+    def write(self, data):
+        if self.extension is None and len(self._head) < SNIFF_SIZE:
+            self._head += bytes(data[:SNIFF_SIZE - len(self._head)])
+            if len(self._head) >= SNIFF_SIZE:
+                self._check_signature()
+        self.size += len(data)
+        if self.max_size and self.size > self.max_size:
+            self.discard()
+            raise RequestEntityTooLarge()
+        self._hash.update(data)
+        return self._file.write(data)
+    
+    def _check_signature(self):
+        self.extension = sniff_image_type(self._head)
+        if self.extension is None:
+            self.discard()
+            raise UnsupportedMediaType('O arquivo enviado não é uma imagem PNG, JPEG, GIF ou WEBP.')
+    
+    def finish(self):
+        """Conclui a recepção; arquivos menores que SNIFF_SIZE são validados aqui"""
+        if self.extension is None:
+            self._check_signature()
+        self._file.flush()
+        return self
+    
+    @property
+    def sha256(self):
+        return self._hash.hexdigest()
+    
+    @property
+    def content_name(self):
+        return f"{self.sha256}.{self.extension}"
+    
+    @property
+    def content_type(self):
+        return CONTENT_TYPES[self.extension]
+    
+    def promote(self, file_path):
+        """Move o temporário para o caminho definitivo"""
+        self._file.close()
+        os.chmod(self.temp_path, 0o644)
+        os.replace(self.temp_path, file_path)
+    
+    def discard(self):
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+    
+    # Interface de arquivo usada pelo werkzeug após o parse
+    def seek(self, *args):
+        return self._file.seek(*args)
+    
+    def read(self, *args):
+        return self._file.read(*args)
+    
+    def tell(self):
+        return self._file.tell()
+    
+    def flush(self):
+        return self._file.flush()
+    
+    def close(self):
+        self.discard()
 
-def save_file_s3(file):
-    """Salva o arquivo no Cloudflare R2 (S3 compatível)"""
-    if not allowed_file(file.filename):
+class UploadRequest(Request):
+    """Request que grava uploads de imagem direto em um HashingUploadStream"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._upload_streams = []
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        view = current_app.view_functions.get(self.endpoint) if self.endpoint else None
+        if getattr(view, 'image_upload', False):
+            stream = HashingUploadStream(
+                current_app.config['UPLOAD_FOLDER'],
+                current_app.config.get('MAX_CONTENT_LENGTH')
+            )
+            # O parse pode abortar antes de request.files existir (cliente
+            # desconectado, 413/415 no meio do corpo); close() remove os temporários
+            self._upload_streams.append(stream)
+            return stream
+        return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+    
+    def close(self):
+        try:
+            super().close()
+        finally:
+            streams, self._upload_streams = self._upload_streams, []
+            for stream in streams:
+                stream.discard()
+    
+    @property
+    def max_content_length(self):
+        view = current_app.view_functions.get(self.endpoint) if current_app and self.endpoint else None
+        config_key = getattr(view, 'upload_limit', None)
+        if config_key:
+            return current_app.config.get(config_key)
+        return super().max_content_length
+
+def image_upload(view):
+    """Marca a rota para receber os arquivos via HashingUploadStream"""
+    view.image_upload = True
+    return view
+
+def upload_limit(config_key):
+    """Usa outro limite de tamanho (chave de configuração) no corpo da rota"""
+    def decorator(view):
+        view.upload_limit = config_key
+        return view
+    return decorator
+
+def ingest_upload(file):
+    """Retorna o upload validado e com hash, lendo o arquivo uma única vez"""
+    stream = getattr(file, 'stream', file)
+    if isinstance(stream, HashingUploadStream):
+        try:
+            return stream.finish()
+        except HTTPException:
+            return None
+    
+    ingest = HashingUploadStream(
+        current_app.config['UPLOAD_FOLDER'],
+        current_app.config.get('MAX_CONTENT_LENGTH')
+    )
+    try:
+        while True:
+            chunk = stream.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            ingest.write(chunk)
+        return ingest.finish()
+    except HTTPException:
         return None
+    except Exception:
+        ingest.discard()
+        raise
+
+def get_s3_client():
+    """Cria o cliente S3 configurado para o Cloudflare R2"""
+    import boto3
+    
+    return boto3.client(
+        's3',
+        endpoint_url=current_app.config.get('S3_ENDPOINT_URL'),
+        region_name=current_app.config.get('S3_REGION', 'auto'),
+        aws_access_key_id=current_app.config.get('S3_ACCESS_KEY_ID'),
+        aws_secret_access_key=current_app.config.get('S3_SECRET_ACCESS_KEY')
+    )
+
+def public_url(filename, storage_type):
+    """URL pública de um arquivo enviado, conforme onde ele foi armazenado"""
+    if storage_type != 's3':
+        return f"/static/uploads/blog/{filename}"
+    base = current_app.config.get('S3_PUBLIC_URL')
+    if not base:
+        # Cloudflare R2 usa URL diferente do S3 padrão
+        # Formato: https://account-id.r2.cloudflarestorage.com/bucket-name/filename
+        base = f"{current_app.config['S3_ENDPOINT_URL'].rstrip('/')}/{current_app.config.get('S3_BUCKET')}"
+    return f"{base.rstrip('/')}/{filename}"
+
+def _upload_info(ingest, storage_type, url, deduplicated):
+    return {
+        'filename': ingest.content_name,
+        'storage_type': storage_type,
+        'url': url,
+        'sha256': ingest.sha256,
+        'size': ingest.size,
+        'content_type': ingest.content_type,
+        'deduplicated': deduplicated,
+    }
+
+def _store_local(ingest):
+    filename = ingest.content_name
+    file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+    
+    if os.path.exists(file_path):
+        # Conteúdo idêntico já armazenado: renova o mtime para a carência do upload_gc.py
+        ingest.discard()
+        os.utime(file_path)
+        deduplicated = True
+    else:
+        ingest.promote(file_path)
+        deduplicated = False
+    
+    return _upload_info(ingest, 'local', public_url(filename, 'local'), deduplicated)
+
+def _store_s3(ingest):
+    from botocore.exceptions import ClientError
+    
+    s3_client = get_s3_client()
+    filename = ingest.content_name
+    bucket_name = current_app.config.get('S3_BUCKET')
     
     try:
-        import boto3
-        from botocore.exceptions import ClientError
-        
-        s3_enabled = current_app.config.get('S3_ENABLED', False)
-        if not s3_enabled:
-            return None
-        
-        # Configurar cliente S3 para Cloudflare R2
-        s3_client = boto3.client(
-            's3',
-            endpoint_url=current_app.config.get('S3_ENDPOINT_URL'),
-            region_name=current_app.config.get('S3_REGION', 'auto'),
-            aws_access_key_id=current_app.config.get('S3_ACCESS_KEY_ID'),
-            aws_secret_access_key=current_app.config.get('S3_SECRET_ACCESS_KEY')
+        s3_client.head_object(Bucket=bucket_name, Key=filename)
+        # Conteúdo idêntico já armazenado: a cópia sobre si mesmo renova o
+        # LastModified usado na carência do upload_gc.py (como o os.utime local)
+        s3_client.copy_object(
+            Bucket=bucket_name,
+            Key=filename,
+            CopySource={'Bucket': bucket_name, 'Key': filename},
+            MetadataDirective='REPLACE',
+            ContentType=ingest.content_type,
+            ACL='public-read'
         )
-        
-        filename = f"{uuid.uuid4().hex}.{file.filename.rsplit('.', 1)[1].lower()}"
-        bucket_name = current_app.config.get('S3_BUCKET')
-        
-        # Fazer upload para Cloudflare R2
-        s3_client.upload_fileobj(
-            file,
+        deduplicated = True
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') not in ('404', 'NoSuchKey', 'NotFound'):
+            raise
+        s3_client.upload_file(
+            ingest.temp_path,
             bucket_name,
             filename,
             ExtraArgs={
                 'ACL': 'public-read',
-                'ContentType': file.content_type or 'image/jpeg'
+                'ContentType': ingest.content_type
             }
         )
-        
-        # Cloudflare R2 usa URL diferente do S3 padrão
-        # Formato: https://account-id.r2.cloudflarestorage.com/bucket-name/filename
-        endpoint = current_app.config['S3_ENDPOINT_URL'].rstrip('/')
-        url = f"{endpoint}/{bucket_name}/{filename}"
-        
-        return {
-            'filename': filename,
-            'storage_type': 's3',
-            'url': url
-        }
-        
+        deduplicated = False
+    
+    return _upload_info(ingest, 's3', public_url(filename, 's3'), deduplicated)
+
+def save_file_local(file):
+    """Salva o arquivo localmente, nomeado pelo hash do conteúdo"""
+    ingest = ingest_upload(file)
+    if not ingest:
+        return None
+    
+    try:
+        return _store_local(ingest)
+    except Exception as e:
+        logger.exception(f"Erro ao salvar arquivo localmente: {e}")
+        return None
+    finally:
+        ingest.discard()
+
+def save_file_s3(file):
+    """Salva o arquivo no Cloudflare R2 (S3 compatível), nomeado pelo hash do conteúdo"""
+    if not current_app.config.get('S3_ENABLED', False):
+        return None
+    
+    ingest = ingest_upload(file)
+    if not ingest:
+        return None
+    
+    try:
+        return _store_s3(ingest)
     except Exception as e:
-        print(f"Erro ao salvar arquivo no Cloudflare R2: {e}")
+        logger.exception(f"Erro ao salvar arquivo no Cloudflare R2: {e}")
         return None
+    finally:
+        ingest.discard()
 
 def save_file(file):
-    """Salva o arquivo usando o método apropriado (local ou Cloudflare R2)"""
-    s3_enabled = current_app.config.get('S3_ENABLED', False)
+    """Salva o arquivo usando o método apropriado (local ou Cloudflare R2)
     
-    # Tentar Cloudflare R2 primeiro se estiver habilitado
-    if s3_enabled:
-        result = save_file_s3(file)
-        if result:
-            return result
+    Uploads repetidos resolvem para o objeto já existente (campo 'deduplicated').
+    """
+    ingest = ingest_upload(file)
+    if not ingest:
+        return None
     
-    # Fallback para armazenamento local
-    return save_file_local(file)
+    try:
+        # Tentar Cloudflare R2 primeiro se estiver habilitado
+        if current_app.config.get('S3_ENABLED', False):
+            try:
+                return _store_s3(ingest)
+            except Exception as e:
+                logger.exception(f"Erro ao salvar arquivo no Cloudflare R2: {e}")
+        
+        # Fallback para armazenamento local
+        try:
+            return _store_local(ingest)
+        except Exception as e:
+            logger.exception(f"Erro ao salvar arquivo localmente: {e}")
+            return None
+    finally:
+        ingest.discard()
 
 def delete_file_local(filename):
     """Exclui arquivo local"""
@@ -112,7 +350,8 @@ def delete_file_local(filename):
         if os.path.exists(file_path):
             os.remove(file_path)
             return True
-    except Exception:
+    except Exception as e:
+        logger.warning(f"Erro ao excluir arquivo local {filename}: {e}")
         return False
     
     return False
@@ -120,19 +359,12 @@ def delete_file_local(filename):
 def delete_file_s3(filename):
     """Exclui arquivo do Cloudflare R2"""
     try:
-        import boto3
-        
-        s3_client = boto3.client(
-            's3',
-            endpoint_url=current_app.config.get('S3_ENDPOINT_URL'),
-            region_name=current_app.config.get('S3_REGION', 'auto'),
-            aws_access_key_id=current_app.config.get('S3_ACCESS_KEY_ID'),
-            aws_secret_access_key=current_app.config.get('S3_SECRET_ACCESS_KEY')
-        )
+        s3_client = get_s3_client()
         
         bucket_name = current_app.config.get('S3_BUCKET')
         s3_client.delete_object(Bucket=bucket_name, Key=filename)
         return True
         
-    except Exception:
+    except Exception as e:
+        logger.warning(f"Erro ao excluir arquivo do Cloudflare R2 {filename}: {e}")
         return False
\ No newline at end of file
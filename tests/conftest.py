@@ -0,0 +1,64 @@
+"""
+Fixtures dos testes
+
+O app é importado com um SQLite temporário (DATABASE_URL precisa existir antes
+do import). Os testes que precisam de PostgreSQL usam TEST_DATABASE_URL e são
+pulados sem ela.
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+_tmpdir = tempfile.mkdtemp(prefix='netfyber-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_tmpdir, 'netfyber.db')}"
+os.environ['DEGRADED_SNAPSHOT_PATH'] = os.path.join(_tmpdir, 'snapshot.json')
+os.environ.setdefault('ADMIN_USERNAME', 'admin')
+os.environ.setdefault('ADMIN_PASSWORD', 'Teste123!')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as netfyber  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    """App com o banco inicializado; cada requisição do client tem o próprio contexto,
+    então o acesso direto ao banco nos testes fica em `with app.app_context()`"""
+    netfyber.app.config['TESTING'] = True
+    with netfyber.app.app_context():
+        netfyber.initialize_database()
+    return netfyber.app
+
+
+@pytest.fixture
+def app_context(app):
+    """Contexto do app para testes que usam o banco sem passar pelo client"""
+    with app.app_context():
+        yield
+        netfyber.db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def admin_client(app, monkeypatch):
+    """Client autenticado no admin (o cookie de sessão seguro não trafega em http://)"""
+    monkeypatch.setitem(app.config, 'SESSION_COOKIE_SECURE', False)
+    client = app.test_client()
+    response = client.post(f'{netfyber.ADMIN_URL_PREFIX}/login', data={
+        'username': os.environ['ADMIN_USERNAME'],
+        'password': os.environ['ADMIN_PASSWORD'],
+    })
+    assert response.status_code == 302
+    return client
+
+
+@pytest.fixture(scope='session')
+def models():
+    return netfyber
@@ -0,0 +1,16 @@
+"""Compressão das respostas: páginas dinâmicas sim, arquivos do send_file não"""
+
+
+def test_pagina_dinamica_sai_comprimida(client):
+    response = client.get('/sobre', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.headers.get('Content-Encoding') == 'gzip'
+
+
+def test_arquivo_estatico_passa_direto(client):
+    response = client.get('/static/css/main.css', headers={'Accept-Encoding': 'gzip'})
+
+    assert response.status_code == 200
+    assert 'Content-Encoding' not in response.headers
+    assert b'{' in response.get_data()
+    response.close()
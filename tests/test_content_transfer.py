@@ -0,0 +1,73 @@
+"""Importação em massa com linhas heterogêneas e ida e volta pelo CSV"""
+
+import io
+import json
+
+from content_transfer import content_transfer
+
+
+def _ndjson(*records):
+    return io.BytesIO(''.join(json.dumps(record) + '\n' for record in records).encode())
+
+
+def test_importa_lote_com_colunas_diferentes_por_linha(app_context, models):
+    rows = content_transfer.parse('planos', _ndjson(
+        {'id': 901, 'nome': 'Plano A', 'preco': '99,90', 'features': 'Wi-Fi', 'ativo': False},
+        {'id': 902, 'nome': 'Plano B', 'preco': '129,90', 'features': 'Wi-Fi'},
+    ))
+
+    report = content_transfer.import_rows('planos', rows)
+
+    assert report['inserir'] == 2
+    planos = {plano.id: plano for plano in models.Plano.query.filter(models.Plano.id.in_([901, 902]))}
+    assert planos[901].ativo is False
+    assert planos[902].ativo is True  # default do modelo
+
+
+def test_atualizacao_mantem_campos_ausentes_da_linha(app_context, models):
+    content_transfer.import_rows('planos', content_transfer.parse('planos', _ndjson(
+        {'id': 903, 'nome': 'Plano C', 'preco': '79,90', 'velocidade': '300 Mega', 'features': 'Wi-Fi'},
+    )))
+
+    content_transfer.import_rows('planos', content_transfer.parse('planos', _ndjson(
+        {'id': 903, 'nome': 'Plano C', 'preco': '89,90', 'features': 'Wi-Fi'},
+    )))
+
+    plano = models.db.session.get(models.Plano, 903)
+    assert (plano.preco, plano.velocidade) == ('89,90', '300 Mega')
+
+
+def test_csv_ida_e_volta_mantem_texto_vazio(app_context, models):
+    db = models.db
+    db.session.add(models.Configuracao(chave='texto_vazio', valor='', descricao=None))
+    db.session.commit()
+    exported = ''.join(content_transfer.export('configuracoes', 'csv'))
+    db.session.query(models.Configuracao).filter_by(chave='texto_vazio').delete()
+    db.session.commit()
+
+    report = content_transfer.import_rows('configuracoes', content_transfer.parse('configuracoes', io.StringIO(exported), 'csv'))
+
+    assert report['inserir'] >= 1
+    assert models.Configuracao.query.filter_by(chave='texto_vazio').one().valor == ''
+
+
+def test_importacao_sanitiza_e_rejeita_como_os_formularios(app_context, models):
+    report = content_transfer.import_rows('configuracoes', content_transfer.parse('configuracoes', _ndjson(
+        {'chave': 'endereco_importado', 'valor': '<script>alert(1)</script>Rua A, 10'},
+    )))
+    assert report['inserir'] == 1
+    valor = models.Configuracao.query.filter_by(chave='endereco_importado').one().valor
+    assert '<script' not in valor and 'Rua A, 10' in valor
+
+    post = {'titulo': 'Importado', 'conteudo': 'Texto', 'resumo': 'Texto', 'categoria': 'noticias',
+            'data_publicacao': '2024-01-01T00:00:00'}
+    report = content_transfer.import_rows('posts', content_transfer.parse('posts', _ndjson(
+        dict(post, id=951, link_materia='javascript:alert(1)'),
+        dict(post, id=952, link_materia='javascript://%0aalert(1)'),
+        dict(post, id=953, link_materia='https://example.com/materia'),
+    )))
+
+    assert (report['inserir'], report['rejeitados']) == (1, 2)
+    assert [erro['chave'] for erro in report['erros']] == [951, 952]
+    ids = {post.id for post in models.Post.query.filter(models.Post.id.in_([951, 952, 953]))}
+    assert ids == {953}
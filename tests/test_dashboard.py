@@ -0,0 +1,54 @@
+"""Números dos cards do admin na mesma base das listagens (só ativos)"""
+
+from datetime import datetime
+
+from sqlalchemy import event
+
+from dashboard import dashboard
+
+
+def test_cards_contam_so_itens_ativos(app_context, models):
+    db = models.db
+    antes_posts, antes_planos = dashboard.post_stats(), dashboard.plano_stats()
+    for ativo in (True, False):
+        db.session.add(models.Post(
+            titulo='Card', conteudo='Conteúdo', resumo='Resumo', categoria='noticias', ativo=ativo,
+            link_materia='https://example.com/materia', data_publicacao=datetime.utcnow()
+        ))
+        db.session.add(models.Plano(nome='Card', preco='99,90', features='Wi-Fi', recomendado=True, ativo=ativo))
+    db.session.commit()
+
+    posts, planos = dashboard.post_stats(), dashboard.plano_stats()
+
+    noticias_antes = antes_posts['por_categoria'].get('noticias', 0)
+    assert posts['por_categoria']['noticias'] == noticias_antes + 1
+    assert posts['ativos'] == antes_posts['ativos'] + 1
+    assert planos['recomendados'] == antes_planos['recomendados'] + 1
+    assert planos['inativos'] == antes_planos['inativos'] + 1
+    assert planos['ativos'] + planos['inativos'] == planos['total']
+
+
+def test_listagem_do_admin_em_numero_fixo_de_consultas(app, admin_client, models):
+    db = models.db
+    with app.app_context():
+        for n in range(3):
+            db.session.add(models.Post(
+                titulo=f'Consulta {n}', conteudo='Conteúdo', resumo='Resumo', categoria='noticias',
+                link_materia='https://example.com/materia', data_publicacao=datetime.utcnow()
+            ))
+        db.session.commit()
+        engine = db.engine
+    consultas = []
+
+    def _registrar(conn, cursor, statement, parameters, context, executemany):
+        consultas.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', _registrar)
+    try:
+        assert admin_client.get(f'{models.ADMIN_URL_PREFIX}/blog').status_code == 200
+    finally:
+        event.remove(engine, 'before_cursor_execute', _registrar)
+
+    # Usuário da sessão, página de posts, total da paginação, cards e visualizações
+    assert len(consultas) == 5, '\n\n'.join(consultas)
+    assert not any('uploads' in consulta for consulta in consultas)
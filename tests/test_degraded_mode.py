@@ -0,0 +1,71 @@
+"""Circuito do banco aberto: /health e páginas públicas não esperam o banco"""
+
+import time
+
+import pytest
+
+from degraded_mode import CircuitBreaker, degraded_mode
+
+
+@pytest.fixture
+def circuito_aberto(app, monkeypatch):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    monkeypatch.setattr(degraded_mode, 'breaker', breaker)
+    return breaker
+
+
+def test_health_nao_consulta_o_banco_com_circuito_aberto(client, models, circuito_aberto, monkeypatch):
+    def execute(*args, **kwargs):
+        raise AssertionError('o /health consultou o banco com o circuito aberto')
+    monkeypatch.setattr(models.db.session, 'execute', execute)
+
+    response = client.get('/health')
+
+    assert response.status_code == 200
+    assert response.json['status'] == 'degraded'
+    assert response.json['database'] == 'circuit open'
+
+
+def test_health_testa_o_banco_quando_o_circuito_permite(client, circuito_aberto):
+    circuito_aberto.opened_at = time.monotonic() - circuito_aberto.reset_timeout
+
+    response = client.get('/health')
+
+    assert response.json['database'] == 'healthy'
+    assert response.json['status'] == 'ok'
+    assert circuito_aberto.state == CircuitBreaker.CLOSED
+
+
+def test_rotas_publicas_tem_prazo_proprio(app):
+    for endpoint in ('index', 'planos', 'blog', 'velocimetro', 'sobre'):
+        assert getattr(app.view_functions[endpoint], 'db_deadline', None), endpoint
+
+
+def test_erro_fora_do_banco_propaga_sem_fechar_o_circuito(app, circuito_aberto):
+    circuito_aberto.opened_at = time.monotonic() - circuito_aberto.reset_timeout
+
+    def loader():
+        raise KeyError('configs')
+
+    with app.test_request_context('/sobre'):
+        with pytest.raises(KeyError):
+            degraded_mode.fetch('configs', loader)
+
+    assert circuito_aberto.state == CircuitBreaker.HALF_OPEN
+    assert circuito_aberto.allow()
+
+
+def test_prazo_de_conexao_so_nas_requisicoes_com_prazo(app):
+    opcoes = app.config['SQLALCHEMY_ENGINE_OPTIONS']
+    assert opcoes['pool_timeout'] == 30
+
+    cparams = {'connect_timeout': 10}
+    degraded_mode._connect_deadline(None, None, [], cparams)
+    assert cparams['connect_timeout'] == 10
+
+    with app.test_request_context('/sobre'):
+        degraded_mode.apply_deadline()
+        degraded_mode._connect_deadline(None, None, [], cparams)
+        degraded_mode.db.session.rollback()
+    assert cparams['connect_timeout'] == 2
@@ -0,0 +1,84 @@
+"""Fragmentos do layout invalidados em todos os workers pelo carimbo no banco"""
+
+from sqlalchemy import event, update
+
+from degraded_mode import degraded_mode
+from fragment_cache import STAMP_NAME, fragment_cache
+
+
+def _definir_telefone(app, models, telefone):
+    db = models.db
+    with app.app_context():
+        configuracao = models.Configuracao.query.filter_by(chave='telefone_contato').first()
+        if configuracao is None:
+            db.session.add(models.Configuracao(chave='telefone_contato', valor=telefone))
+        else:
+            configuracao.valor = telefone
+        db.session.commit()
+
+
+def _versao(app, models):
+    with app.app_context():
+        carimbo = models.db.session.get(models.VersaoCache, STAMP_NAME)
+        return carimbo.versao if carimbo else 0
+
+
+def test_alteracao_em_outro_worker_renova_fragmentos(app, client, models, monkeypatch):
+    monkeypatch.setattr(fragment_cache, 'version_ttl', 0)
+    _definir_telefone(app, models, '(63) 1111-1111')
+    assert '(63) 1111-1111' in client.get('/sobre').get_data(as_text=True)
+
+    # Outro worker: altera e incrementa o carimbo sem passar pela sessão deste processo
+    table = models.Configuracao.__table__
+    with app.app_context(), models.db.engine.begin() as connection:
+        connection.execute(update(table).where(table.c.chave == 'telefone_contato').values(valor='(63) 2222-2222'))
+        fragment_cache.bump(connection)
+
+    html = client.get('/sobre').get_data(as_text=True)
+    assert '(63) 2222-2222' in html
+    assert '(63) 1111-1111' not in html
+
+
+def test_commit_de_configuracao_incrementa_carimbo(app, client, models):
+    client.get('/sobre')
+    antes = _versao(app, models)
+
+    _definir_telefone(app, models, '(63) 3333-3333')
+
+    assert _versao(app, models) == antes + 1
+    assert '(63) 3333-3333' in client.get('/sobre').get_data(as_text=True)
+
+
+def test_carimbo_relido_so_depois_do_ttl(app, client, models, monkeypatch):
+    monkeypatch.setattr(fragment_cache, 'version_ttl', 60)
+    monkeypatch.setattr(fragment_cache, '_version_checked_at', None)
+    consultas = []
+
+    def _registrar(conn, cursor, statement, parameters, context, executemany):
+        if 'versoes_cache' in statement:
+            consultas.append(statement)
+
+    with app.app_context():
+        engine = models.db.engine
+    event.listen(engine, 'before_cursor_execute', _registrar)
+    try:
+        for _ in range(3):
+            client.get('/sobre')
+    finally:
+        event.remove(engine, 'before_cursor_execute', _registrar)
+
+    assert len(consultas) == 1
+
+
+def test_fragmento_do_snapshot_nao_fica_no_cache(app, client, models, monkeypatch):
+    monkeypatch.setattr(fragment_cache, 'version_ttl', 0)
+    _definir_telefone(app, models, '(63) 4444-4444')
+    degraded_mode.refresh(force=True)
+    _definir_telefone(app, models, '(63) 5555-5555')
+    fragment_cache.invalidate()
+
+    monkeypatch.setattr(degraded_mode.breaker, 'allow', lambda: False)
+    assert '(63) 4444-4444' in client.get('/sobre').get_data(as_text=True)
+    monkeypatch.undo()
+
+    assert '(63) 5555-5555' in client.get('/sobre').get_data(as_text=True)
@@ -0,0 +1,20 @@
+"""Migrações levam um banco vazio ao mesmo schema dos modelos"""
+
+from sqlalchemy import create_engine, inspect
+
+import migrations
+
+
+def test_banco_vazio_migrado_tem_o_schema_dos_modelos(models, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrado.db'}")
+
+    assert migrations.upgrade(engine) == [version for version, _, _ in migrations.MIGRATIONS]
+    assert migrations.upgrade(engine) == []
+
+    inspector = inspect(engine)
+    for table in models.db.metadata.sorted_tables:
+        colunas = {column['name'] for column in inspector.get_columns(table.name)}
+        assert colunas == set(table.columns.keys()), table.name
+        indices = {index['name'] for index in inspector.get_indexes(table.name)}
+        assert indices == {index.name for index in table.indexes}, table.name
+    engine.dispose()
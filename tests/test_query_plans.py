@@ -0,0 +1,183 @@
+"""
+Planos de execução das consultas das páginas no PostgreSQL
+
+As consultas são as que as rotas realmente fazem: os requests rodam no app de
+teste e cada statement do ORM é capturado, compilado para o PostgreSQL e
+explicado num banco com volume de produção (ANALYZE feito, seq scan liberado).
+O schema desse banco vem de migrations.upgrade(), não dos modelos: os índices
+conferidos são os que as migrações de fato criam em produção.
+Precisa de TEST_DATABASE_URL apontando para um PostgreSQL descartável.
+"""
+
+import os
+from contextlib import contextmanager
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, event, text
+
+import migrations
+
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL')
+
+pytestmark = pytest.mark.skipif(
+    not (TEST_DATABASE_URL or '').startswith(('postgres://', 'postgresql')),
+    reason='TEST_DATABASE_URL (PostgreSQL) não configurada'
+)
+
+# Histórico grande e quase todo inativo (posts e planos antigos desativados): é o
+# volume em que as listagens só ficam rápidas pelos índices de (ativo, ...)
+SEED = [
+    """INSERT INTO posts (id, titulo, conteudo, resumo, categoria, imagem, link_materia, data_publicacao, ativo, created_at)
+       SELECT n, 'Post ' || n, 'Conteúdo ' || n, 'Resumo ' || n,
+              CASE WHEN n % 2 = 0 THEN 'noticias' ELSE 'tecnologia' END, 'default.jpg',
+              'https://example.com/' || n, now() - n * interval '1 hour', n % 50 = 0, now()
+       FROM generate_series(1, 20000) AS n""",
+    """INSERT INTO planos (id, nome, preco, velocidade, features, recomendado, ordem_exibicao, ativo, created_at)
+       SELECT n, 'Plano ' || n, '99,90', '500 Mega', 'Wi-Fi', n % 10 = 0, n, n % 100 = 0, now()
+       FROM generate_series(1, 5000) AS n""",
+    """INSERT INTO post_visualizacoes (post_id, total, updated_at)
+       SELECT n, (n * 7919) % 100000, now() FROM generate_series(1, 20000) AS n""",
+    """INSERT INTO posts_relacionados (post_id, posicao, relacionado_id, score)
+       SELECT n, p, (n + p * 37) % 20000 + 1, 1.0 / p
+       FROM generate_series(1, 20000) AS n, generate_series(1, 4) AS p""",
+]
+
+
+def _drop_schema(engine, metadata):
+    with engine.begin() as conn:
+        metadata.drop_all(conn)
+        conn.execute(text('DROP TABLE IF EXISTS schema_migrations'))
+
+
+@pytest.fixture(scope='module')
+def postgres(models):
+    engine = create_engine(TEST_DATABASE_URL.replace('postgres://', 'postgresql://', 1))
+    metadata = models.db.metadata
+    _drop_schema(engine, metadata)
+    migrations.upgrade(engine)
+    with engine.begin() as conn:
+        for statement in SEED:
+            conn.execute(text(statement))
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        conn.execute(text('ANALYZE'))
+    yield engine
+    _drop_schema(engine, metadata)
+    engine.dispose()
+
+
+@pytest.fixture
+def sample_content(app, models):
+    """Alguns posts e planos no SQLite para as rotas percorrerem todas as consultas"""
+    db = models.db
+    with app.app_context():
+        for n in range(3):
+            post = models.Post(
+                titulo=f'Plano de fibra {n}', conteudo='Conteúdo sobre fibra', resumo='Resumo',
+                categoria='noticias', link_materia='https://example.com/materia',
+                data_publicacao=datetime.utcnow()
+            )
+            db.session.add(post)
+            db.session.flush()
+            db.session.add(models.VisualizacaoPost(post_id=post.id, total=n + 1))
+        db.session.commit()
+
+
+@contextmanager
+def captured_statements(models):
+    """Statements do ORM executados dentro do bloco, com os parâmetros já vinculados"""
+    statements = []
+
+    def _capture(state):
+        if state.is_select:
+            statement = state.statement
+            if isinstance(state.parameters, dict) and state.parameters:
+                statement = statement.params(**state.parameters)
+            statements.append(statement)
+
+    event.listen(models.db.session, 'do_orm_execute', _capture)
+    try:
+        yield statements
+    finally:
+        event.remove(models.db.session, 'do_orm_execute', _capture)
+
+
+def explain_all(engine, statements):
+    plans = []
+    with engine.connect() as conn:
+        for statement in statements:
+            sql = statement.compile(dialect=engine.dialect, compile_kwargs={'literal_binds': True})
+            plans.append('\n'.join(row[0] for row in conn.execute(text(f'EXPLAIN {sql}'))))
+    return plans
+
+
+def uses_index(plans, index_name):
+    return any(f'using {index_name} ' in plan or f'on {index_name}' in plan for plan in plans)
+
+
+def test_listagem_de_posts_do_admin_usa_indice(postgres, admin_client, models, sample_content):
+    from app import ADMIN_URL_PREFIX
+
+    with captured_statements(models) as statements:
+        assert admin_client.get(f'{ADMIN_URL_PREFIX}/blog').status_code == 200
+
+    plans = explain_all(postgres, statements)
+    assert uses_index(plans, 'ix_posts_ativo_data'), '\n\n'.join(plans)
+
+
+def test_listagem_de_planos_do_admin_usa_indice(postgres, admin_client, models):
+    from app import ADMIN_URL_PREFIX
+
+    with captured_statements(models) as statements:
+        assert admin_client.get(f'{ADMIN_URL_PREFIX}/planos').status_code == 200
+
+    plans = explain_all(postgres, statements)
+    assert uses_index(plans, 'ix_planos_ativo_ordem'), '\n\n'.join(plans)
+
+
+def test_snapshot_dos_posts_recentes_usa_indice(postgres, app, models):
+    from degraded_mode import degraded_mode
+
+    with app.app_context(), captured_statements(models) as statements:
+        degraded_mode.sources['posts'][1]()
+
+    plans = explain_all(postgres, statements)
+    assert uses_index(plans, 'ix_posts_ativo_data'), '\n\n'.join(plans)
+
+
+def test_mais_lidos_usa_indice(postgres, app, models, sample_content):
+    from view_counter import view_counter
+
+    with captured_statements(models) as statements:
+        view_counter.refresh_top()
+
+    plans = explain_all(postgres, statements)
+    assert uses_index(plans, 'ix_post_visualizacoes_total'), '\n\n'.join(plans)
+
+
+def test_posts_relacionados_do_blog_usam_chave_primaria(postgres, app, client, models, sample_content):
+    with captured_statements(models) as statements:
+        client.get('/blog').get_data()
+
+    plans = explain_all(postgres, statements)
+    assert uses_index(plans, 'posts_relacionados_pkey'), '\n\n'.join(plans)
+
+
+def test_blog_publico_usa_indice(postgres, client, models, sample_content):
+    with captured_statements(models) as statements:
+        response = client.get('/blog')
+        response.get_data()
+        assert response.status_code == 200
+
+    plans = explain_all(postgres, statements)
+    assert uses_index(plans, 'ix_posts_ativo_data'), '\n\n'.join(plans)
+
+
+def test_planos_publicos_usam_indice(postgres, client, models):
+    with captured_statements(models) as statements:
+        response = client.get('/planos')
+        response.get_data()
+        assert response.status_code == 200
+
+    plans = explain_all(postgres, statements)
+    assert uses_index(plans, 'ix_planos_ativo_ordem'), '\n\n'.join(plans)
@@ -0,0 +1,146 @@
+"""Posts relacionados: a atualização incremental chega no mesmo índice da reconstrução"""
+
+import random
+from datetime import datetime
+
+import pytest
+
+from related_posts import RelatedPosts
+
+TEMAS = {
+    'Redes': 'fibra roteador antena sinal latencia banda modem cabo switch provedor velocidade pacote',
+    'Cozinha': 'receita forno massa tempero farinha panela molho queijo manteiga assado fermento sobremesa',
+    'Esportes': 'futebol goleiro campeonato torcida estadio artilheiro escalacao treinador zagueiro penalti rodada placar',
+}
+
+
+def _texto(sorteio, palavras):
+    return ' '.join(' '.join([palavra] * sorteio.randint(1, 4)) for palavra in sorteio.sample(palavras, 6))
+
+
+@pytest.fixture
+def posts(app, models):
+    """Seis posts por tema, sem vocabulário em comum entre os temas"""
+    db = models.db
+    sorteio = random.Random(7)
+    ids = {}
+    with app.app_context():
+        for categoria, palavras in TEMAS.items():
+            palavras = palavras.split()
+            criados = [
+                models.Post(titulo=_texto(sorteio, palavras), resumo=_texto(sorteio, palavras),
+                            conteudo=_texto(sorteio, palavras), categoria=categoria,
+                            link_materia='https://example.com/materia', data_publicacao=datetime.utcnow())
+                for _ in range(6)
+            ]
+            db.session.add_all(criados)
+            db.session.flush()
+            ids[categoria] = [post.id for post in criados]
+        db.session.commit()
+    yield ids
+    with app.app_context():
+        db.session.query(models.PostRelacionado).delete()
+        todos = [post_id for lista in ids.values() for post_id in lista]
+        db.session.query(models.Post).filter(models.Post.id.in_(todos)).delete(synchronize_session=False)
+        db.session.commit()
+
+
+def _indice(app, models):
+    """Índice de um worker que ainda não calculou nada neste processo"""
+    indice = RelatedPosts()
+    indice.init_app(app, models.db, models.Post, models.PostRelacionado)
+    indice.k = 2
+    return indice
+
+
+def _listas(models):
+    listas = {}
+    for linha in models.PostRelacionado.query.order_by(models.PostRelacionado.post_id, models.PostRelacionado.posicao):
+        listas.setdefault(linha.post_id, []).append((linha.relacionado_id, linha.score))
+    return listas
+
+
+def test_incremental_recalcula_so_as_listas_afetadas(app, models, posts, monkeypatch):
+    db = models.db
+    a, b = posts['Redes'][0], posts['Cozinha'][0]
+    with app.app_context():
+        _indice(app, models).rebuild()
+        antes = _listas(models)
+
+        # Os dois trocam de conteúdo: vocabulário e IDF continuam os mesmos
+        post_a, post_b = db.session.get(models.Post, a), db.session.get(models.Post, b)
+        for campo in ('titulo', 'resumo', 'conteudo', 'categoria'):
+            valor_a, valor_b = getattr(post_a, campo), getattr(post_b, campo)
+            setattr(post_a, campo, valor_b)
+            setattr(post_b, campo, valor_a)
+        db.session.commit()
+
+        outro = _indice(app, models)
+        recalculadas = []
+        vizinhos = outro._neighbours
+        monkeypatch.setattr(outro, '_neighbours', lambda rows: recalculadas.extend(rows) or vizinhos(rows))
+        outro.update([a, b])
+        incremental = _listas(models)
+
+        _indice(app, models).rebuild()
+        completo = _listas(models)
+
+    alterados = {a, b}
+    esperadas = alterados | {
+        post_id for listas in (antes, incremental) for post_id, lista in listas.items()
+        if alterados & {relacionado for relacionado, _ in lista}
+    }
+    assert {int(outro._ids[row]) for row in recalculadas} == esperadas
+    assert len(esperadas) < len(antes)
+
+    assert incremental.keys() == completo.keys()
+    for post_id, lista in completo.items():
+        assert [relacionado for relacionado, _ in incremental[post_id]] == [relacionado for relacionado, _ in lista]
+        assert [score for _, score in incremental[post_id]] == pytest.approx([score for _, score in lista], rel=1e-5)
+
+
+def test_posts_desativados_e_excluidos_saem_do_indice(app, models, posts):
+    db = models.db
+    desativado, excluido = posts['Esportes'][:2]
+    with app.app_context():
+        _indice(app, models).rebuild()
+        db.session.get(models.Post, desativado).ativo = False
+        db.session.delete(db.session.get(models.Post, excluido))
+        db.session.commit()
+
+        _indice(app, models).update([desativado, excluido])
+        listas = _listas(models)
+
+    removidos = {desativado, excluido}
+    assert not removidos & listas.keys()
+    for post_id in posts['Esportes'][2:]:
+        relacionados = [relacionado for relacionado, _ in listas[post_id]]
+        assert len(relacionados) == 2
+        assert not removidos & set(relacionados)
+
+
+def test_post_novo_entra_como_linha_nova(app, models, posts):
+    db = models.db
+    with app.app_context():
+        _indice(app, models).rebuild()
+        outro = _indice(app, models)
+        outro._fit()
+        linhas = len(outro._ids)
+
+        palavras = TEMAS['Redes'].split()
+        novo = models.Post(titulo=' '.join(palavras[:3]), resumo=' '.join(palavras[3:6]),
+                           conteudo=' '.join(palavras[6:]), categoria='Redes',
+                           link_materia='https://example.com/materia', data_publicacao=datetime.utcnow())
+        db.session.add(novo)
+        db.session.commit()
+        novo_id = novo.id
+        posts['Redes'].append(novo_id)
+
+        outro.update([novo_id])
+        listas = _listas(models)
+
+    assert outro._rows[novo_id] == linhas
+    assert outro._matrix.shape[0] == linhas + 1
+    relacionados = {relacionado for relacionado, _ in listas[novo_id]}
+    assert len(relacionados) == 2
+    assert relacionados <= set(posts['Redes'])
@@ -0,0 +1,32 @@
+"""Registro dos requests em streaming inclui a renderização do template"""
+
+import logging
+
+
+class _Captura(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def test_pagina_em_streaming_registrada_ao_fechar(app, client):
+    captura = _Captura()
+    logger = logging.getLogger('netfyber.request')
+    logger.addHandler(captura)
+    try:
+        response = client.get('/blog')
+        assert response.is_streamed
+        response.get_data()
+        assert not captura.records  # corpo enviado, resposta ainda aberta
+
+        response.close()
+    finally:
+        logger.removeHandler(captura)
+
+    [record] = captura.records
+    assert record.endpoint == 'blog'
+    assert record.request_id == response.headers['X-Request-ID']
+    assert record.db_queries > 0
@@ -0,0 +1,39 @@
+"""URLs das imagens do blog conforme o backend onde o upload foi armazenado"""
+
+from datetime import datetime
+
+
+def _post_com_imagem(app, models, filename, storage_type):
+    db = models.db
+    with app.app_context():
+        db.session.add(models.Upload(filename=filename, sha256='0' * 64, storage_type=storage_type, ref_count=1))
+        db.session.add(models.Post(
+            titulo=f'Post {filename}', conteudo='Conteúdo', resumo='Resumo', categoria='Tecnologia',
+            imagem=filename, link_materia='https://example.com/materia', data_publicacao=datetime.utcnow()
+        ))
+        db.session.commit()
+
+
+def test_post_no_r2_renderiza_url_publica_do_bucket(app, client, models):
+    app.config.update(S3_PUBLIC_URL='https://pub-teste.r2.dev', S3_ENDPOINT_URL='https://conta.r2.cloudflarestorage.com')
+    _post_com_imagem(app, models, 'a' * 64 + '.png', 's3')
+
+    html = client.get('/blog').get_data(as_text=True)
+
+    assert f'src="https://pub-teste.r2.dev/{"a" * 64}.png"' in html
+    assert f'/static/uploads/blog/{"a" * 64}.png' not in html
+
+
+def test_post_local_renderiza_caminho_estatico(app, client, models):
+    _post_com_imagem(app, models, 'b' * 64 + '.png', 'local')
+
+    html = client.get('/blog').get_data(as_text=True)
+
+    assert f'src="/static/uploads/blog/{"b" * 64}.png"' in html
+
+
+def test_url_do_r2_sem_dominio_publico_usa_endpoint(app, models):
+    app.config.update(S3_PUBLIC_URL=None, S3_ENDPOINT_URL='https://conta.r2.cloudflarestorage.com/', S3_BUCKET='netfyber')
+
+    with app.app_context():
+        assert models.public_url('c.png', 's3') == 'https://conta.r2.cloudflarestorage.com/netfyber/c.png'
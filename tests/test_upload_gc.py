@@ -0,0 +1,60 @@
+"""Coleta de uploads órfãos: só os registros dos arquivos realmente excluídos são removidos"""
+
+import os
+import time
+
+import upload_gc
+
+
+def _arquivo(pasta, nome, horas_atras):
+    caminho = pasta / nome
+    caminho.write_bytes(b'\x89PNG\r\n\x1a\n' + nome.encode())
+    modificado = time.time() - horas_atras * 3600
+    os.utime(caminho, (modificado, modificado))
+
+
+def _registrar(models, nome):
+    models.db.session.add(models.Upload(filename=nome, sha256='0' * 64, storage_type='local', ref_count=0))
+
+
+def test_remove_apenas_registros_dos_arquivos_excluidos(app, models, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'UPLOAD_FOLDER', str(tmp_path))
+    antigos = [f'{letra * 64}.png' for letra in 'def']
+    recente = 'e0' * 32 + '.png'
+    for nome in antigos:
+        _arquivo(tmp_path, nome, horas_atras=48)
+    _arquivo(tmp_path, recente, horas_atras=1)
+    with app.app_context():
+        for nome in antigos + [recente]:
+            _registrar(models, nome)
+        models.db.session.commit()
+
+    simulacao = upload_gc.collect_garbage(dry_run=True, grace_hours=24, pause=0)
+    assert simulacao[0]['purged_records'] == 0
+
+    reports = upload_gc.collect_garbage(dry_run=False, grace_hours=24, pause=0, max_deletes=2)
+
+    assert reports[0]['deleted'] == 2
+    assert reports[0]['purged_records'] == 2
+    with app.app_context():
+        restantes = {
+            upload.filename for upload in
+            models.Upload.query.filter(models.Upload.filename.in_(antigos + [recente]))
+        }
+    sobreviventes = {nome for nome in antigos if (tmp_path / nome).exists()}
+    assert len(sobreviventes) == 1
+    assert restantes == sobreviventes | {recente}
+
+
+def test_remove_temporarios_antigos_de_uploads_interrompidos(app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'UPLOAD_FOLDER', str(tmp_path))
+    _arquivo(tmp_path, '.upload-antigo.tmp', horas_atras=48)
+    _arquivo(tmp_path, '.upload-em-andamento.tmp', horas_atras=0)
+
+    simulacao = upload_gc.collect_garbage(dry_run=True, grace_hours=24, pause=0)
+    assert simulacao[0]['stale_temp'] == 1
+    assert (tmp_path / '.upload-antigo.tmp').exists()
+
+    upload_gc.collect_garbage(dry_run=False, grace_hours=24, pause=0)
+
+    assert [arquivo.name for arquivo in tmp_path.iterdir()] == ['.upload-em-andamento.tmp']
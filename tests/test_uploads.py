@@ -0,0 +1,46 @@
+"""Uploads de imagem: temporários de envios interrompidos e contagem de referências"""
+
+import io
+
+from werkzeug.datastructures import FileStorage
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 256
+
+
+def _multipart(conteudo, boundary='limite'):
+    return (
+        f'--{boundary}\r\n'
+        'Content-Disposition: form-data; name="imagem"; filename="foto.png"\r\n'
+        'Content-Type: image/png\r\n\r\n'
+    ).encode() + conteudo + f'\r\n--{boundary}--\r\n'.encode()
+
+
+def test_upload_interrompido_nao_deixa_temporario(app, admin_client, models, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'UPLOAD_FOLDER', str(tmp_path))
+    corpo = _multipart(PNG * 64)
+
+    # Content-Length maior que o corpo: o parse aborta com o cliente "desconectado"
+    admin_client.post(
+        f'{models.ADMIN_URL_PREFIX}/blog/adicionar',
+        input_stream=io.BytesIO(corpo[:len(corpo) // 2]),
+        content_type='multipart/form-data; boundary=limite',
+        content_length=len(corpo),
+    )
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_envios_identicos_somam_referencias(app, models, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'UPLOAD_FOLDER', str(tmp_path))
+
+    with app.test_request_context():
+        nomes = [
+            models.registrar_upload(FileStorage(io.BytesIO(PNG + b'refs'), filename='foto.png'))
+            for _ in range(2)
+        ]
+        models.db.session.commit()
+        uploads = models.Upload.query.filter_by(filename=nomes[0]).all()
+
+    assert nomes[0] == nomes[1]
+    assert [upload.ref_count for upload in uploads] == [2]
+    assert [arquivo.name for arquivo in tmp_path.iterdir()] == [nomes[0]]
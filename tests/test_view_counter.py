@@ -0,0 +1,34 @@
+"""Lista dos mais lidos atualizada em todos os workers"""
+
+import time
+from datetime import datetime
+
+
+def test_mais_lidos_atualiza_sem_leituras_pendentes(app, models, monkeypatch):
+    from view_counter import view_counter
+
+    db = models.db
+    with app.app_context():
+        post = models.Post(
+            titulo='Mais lido', conteudo='Conteúdo', resumo='Resumo', categoria='Tecnologia',
+            link_materia='https://example.com/materia', data_publicacao=datetime.utcnow()
+        )
+        db.session.add(post)
+        db.session.commit()
+        post_id = post.id
+
+    # Reinicia a thread com intervalo curto e sem nenhum incremento neste processo
+    view_counter._worker.stop()
+    monkeypatch.setattr(view_counter, 'flush_interval', 0.05)
+    monkeypatch.setattr(view_counter._worker, '_pid', None)
+    view_counter.top()
+
+    # Visualizações gravadas por outro worker
+    with app.app_context():
+        db.session.add(models.VisualizacaoPost(post_id=post_id, total=42))
+        db.session.commit()
+
+    deadline = time.monotonic() + 5
+    while (post_id, 42) not in view_counter.top() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert (post_id, 42) in view_counter.top()
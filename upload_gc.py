@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Coletor de uploads órfãos (armazenamento local e Cloudflare R2)
+Executar: python upload_gc.py [--apply] [--grace-hours 24] [--batch-size 100] [--pause 0.5]
+
+Por padrão roda em modo simulação (dry-run) e apenas gera o relatório.
+"""
+
+import os
+import sys
+import time
+import argparse
+from datetime import datetime, timedelta, timezone
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db, Post, Upload
+from storage import get_s3_client
+from logging_setup import get_logger
+
+logger = get_logger('upload_gc')
+
+# Limite do DeleteObjects do S3/R2 por chamada
+S3_MAX_DELETE_BATCH = 1000
+
+
+def normalize_reference(imagem):
+    """Reduz o valor de Post.imagem ao nome do objeto armazenado"""
+    if not imagem or imagem == 'default.jpg':
+        return None
+    return imagem.split('?', 1)[0].rstrip('/').rsplit('/', 1)[-1] or None
+
+
+def collect_referenced(batch_size=1000):
+    """Conjunto com os nomes de arquivos referenciados pelos posts ou com ref_count > 0"""
+    referenced = set()
+    query = db.session.query(Post.imagem).filter(Post.imagem.isnot(None))
+    for (imagem,) in query.yield_per(batch_size):
+        name = normalize_reference(imagem)
+        if name:
+            referenced.add(name)
+    query = db.session.query(Upload.filename).filter(Upload.ref_count > 0)
+    for (filename,) in query.yield_per(batch_size):
+        referenced.add(filename)
+    return referenced
+
+
+def purge_unreferenced_uploads(deleted, batch_size=500):
+    """Remove os registros de Upload sem referências cujo arquivo foi coletado.
+    
+    Só recebe as chaves realmente excluídas: arquivos poupados pela carência, pelo
+    --max-deletes ou por falha na exclusão mantêm o registro para a próxima coleta.
+    """
+    removed = 0
+    for batch in iter_batches(sorted(deleted), batch_size):
+        removed += Upload.query.filter(
+            Upload.ref_count <= 0,
+            Upload.filename.in_(batch)
+        ).delete(synchronize_session=False)
+    db.session.commit()
+    return removed
+
+
+def iter_local_objects(upload_folder):
+    """Lista os uploads locais em streaming via os.scandir: (nome, modificado_em, tamanho)"""
+    if not os.path.isdir(upload_folder):
+        return
+    with os.scandir(upload_folder) as entries:
+        for entry in entries:
+            if not entry.is_file(follow_symlinks=False) or entry.name.startswith('.'):
+                continue
+            stat = entry.stat(follow_symlinks=False)
+            modified = datetime.fromtimestamp(stat.st_mtime, tz=timezone.utc)
+            yield entry.name, modified, stat.st_size
+
+
+def sweep_stale_temp_files(upload_folder, grace_period, report):
+    """Remove os .upload-*.tmp de uploads interrompidos mais antigos que a carência"""
+    if not os.path.isdir(upload_folder):
+        return report
+    cutoff = (datetime.now(timezone.utc) - grace_period).timestamp()
+    with os.scandir(upload_folder) as entries:
+        for entry in entries:
+            if not (entry.name.startswith('.upload-') and entry.name.endswith('.tmp')):
+                continue
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            stat = entry.stat(follow_symlinks=False)
+            if stat.st_mtime > cutoff:
+                continue
+            report['stale_temp'] += 1
+            if report['dry_run']:
+                continue
+            try:
+                os.remove(entry.path)
+                report['freed_bytes'] += stat.st_size
+            except FileNotFoundError:
+                pass
+            except OSError:
+                report['errors'].append(entry.name)
+    return report
+
+
+def iter_s3_objects(s3_client, bucket_name, prefix=''):
+    """Lista os objetos do bucket paginando o list_objects_v2: (chave, modificado_em, tamanho)"""
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            yield obj['Key'], obj['LastModified'], obj['Size']
+
+
+def iter_orphans(objects, referenced, grace_period, report):
+    """Filtra os objetos não referenciados e mais antigos que o período de carência"""
+    cutoff = datetime.now(timezone.utc) - grace_period
+    for name, modified, size in objects:
+        report['scanned'] += 1
+        if name in referenced:
+            continue
+        if modified > cutoff:
+            report['skipped_recent'] += 1
+            continue
+        report['orphans'] += 1
+        report['orphan_bytes'] += size
+        yield name, size
+
+
+def iter_batches(items, batch_size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def delete_local_batch(upload_folder, batch):
+    """Exclui um lote de arquivos locais; retorna (nomes excluídos, bytes, erros)"""
+    deleted, freed, errors = [], 0, []
+    root = os.path.abspath(upload_folder)
+    for name, size in batch:
+        file_path = os.path.abspath(os.path.join(root, name))
+        if os.path.dirname(file_path) != root:
+            errors.append(name)
+            continue
+        try:
+            os.remove(file_path)
+            deleted.append(name)
+            freed += size
+        except FileNotFoundError:
+            # Já removido por outro processo: o registro também pode ser descartado
+            deleted.append(name)
+        except OSError:
+            errors.append(name)
+    return deleted, freed, errors
+
+
+def delete_s3_batch(s3_client, bucket_name, batch):
+    """Exclui um lote de objetos com uma única chamada DeleteObjects"""
+    sizes = dict(batch)
+    response = s3_client.delete_objects(
+        Bucket=bucket_name,
+        Delete={'Objects': [{'Key': key} for key in sizes], 'Quiet': True}
+    )
+    errors = [error['Key'] for error in response.get('Errors', [])]
+    failed = set(errors)
+    deleted = [key for key in sizes if key not in failed]
+    return deleted, sum(sizes[key] for key in deleted), errors
+
+
+def new_report(backend, dry_run):
+    return {
+        'backend': backend,
+        'dry_run': dry_run,
+        'scanned': 0,
+        'orphans': 0,
+        'orphan_bytes': 0,
+        'skipped_recent': 0,
+        'stale_temp': 0,
+        'deleted': 0,
+        'freed_bytes': 0,
+        'errors': [],
+        'sample': [],
+    }
+
+
+def sweep(objects, referenced, delete_batch, report, grace_period, batch_size, pause, max_deletes,
+          deleted_keys, sample_size=20):
+    """Percorre a listagem e remove os órfãos em lotes, com pausa entre eles.
+    
+    Os nomes realmente excluídos são acumulados em deleted_keys.
+    """
+    orphans = iter_orphans(objects, referenced, grace_period, report)
+    for batch in iter_batches(orphans, batch_size):
+        if len(report['sample']) < sample_size:
+            report['sample'].extend(name for name, _ in batch[:sample_size - len(report['sample'])])
+        if report['dry_run']:
+            continue
+        if max_deletes is not None:
+            remaining = max_deletes - report['deleted']
+            if remaining <= 0:
+                continue
+            batch = batch[:remaining]
+        deleted, freed, errors = delete_batch(batch)
+        deleted_keys.update(deleted)
+        report['deleted'] += len(deleted)
+        report['freed_bytes'] += freed
+        report['errors'].extend(errors)
+        if pause:
+            time.sleep(pause)
+    return report
+
+
+def collect_garbage(dry_run=True, grace_hours=None, batch_size=None, pause=None, max_deletes=None):
+    """Executa a coleta nos backends configurados e retorna um relatório por backend"""
+    config = app.config
+    grace_period = timedelta(hours=config['UPLOAD_GC_GRACE_HOURS'] if grace_hours is None else grace_hours)
+    batch_size = batch_size or config['UPLOAD_GC_BATCH_SIZE']
+    pause = config['UPLOAD_GC_BATCH_PAUSE'] if pause is None else pause
+
+    with app.app_context():
+        referenced = collect_referenced()
+        deleted_keys = set()
+        reports = []
+
+        upload_folder = config['UPLOAD_FOLDER']
+        report = new_report('local', dry_run)
+        sweep(
+            iter_local_objects(upload_folder),
+            referenced,
+            lambda batch: delete_local_batch(upload_folder, batch),
+            report, grace_period, batch_size, pause, max_deletes, deleted_keys
+        )
+        sweep_stale_temp_files(upload_folder, grace_period, report)
+        reports.append(report)
+
+        if config.get('S3_ENABLED'):
+            s3_client = get_s3_client()
+            bucket_name = config.get('S3_BUCKET')
+            report = new_report('s3', dry_run)
+            sweep(
+                iter_s3_objects(s3_client, bucket_name),
+                referenced,
+                lambda batch: delete_s3_batch(s3_client, bucket_name, batch),
+                report, grace_period, min(batch_size, S3_MAX_DELETE_BATCH), pause, max_deletes,
+                deleted_keys
+            )
+            reports.append(report)
+
+        purged = 0
+        if deleted_keys:
+            purged = purge_unreferenced_uploads(deleted_keys)
+
+        for report in reports:
+            report['referenced'] = len(referenced)
+            report['purged_records'] = purged
+        return reports
+
+
+def print_report(reports):
+    for report in reports:
+        mode = 'SIMULAÇÃO' if report['dry_run'] else 'EXECUÇÃO'
+        print(f"\n🗑️  Uploads órfãos - {report['backend']} ({mode})")
+        print(f"   Objetos listados: {report['scanned']}")
+        print(f"   Referências: {report['referenced']}")
+        print(f"   Dentro da carência: {report['skipped_recent']}")
+        print(f"   Órfãos: {report['orphans']} ({report['orphan_bytes'] / 1024:.1f} KB)")
+        if report['stale_temp']:
+            print(f"   Temporários de uploads interrompidos: {report['stale_temp']}")
+        if not report['dry_run']:
+            print(f"   Excluídos: {report['deleted']} ({report['freed_bytes'] / 1024:.1f} KB)")
+            print(f"   Registros de upload removidos: {report['purged_records']}")
+        if report['errors']:
+            print(f"   ⚠️ Falhas: {len(report['errors'])}")
+        for name in report['sample']:
+            print(f"   - {name}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Remove uploads não referenciados por nenhum post')
+    parser.add_argument('--apply', action='store_true', help='exclui de fato (padrão: apenas relatório)')
+    parser.add_argument('--grace-hours', type=float, help='ignora arquivos mais novos que isso')
+    parser.add_argument('--batch-size', type=int, help='quantidade de exclusões por lote')
+    parser.add_argument('--pause', type=float, help='segundos de pausa entre lotes')
+    parser.add_argument('--max-deletes', type=int, help='limite de exclusões nesta execução')
+    args = parser.parse_args()
+
+    print("🚀 INICIANDO COLETA DE UPLOADS ÓRFÃOS")
+    try:
+        print_report(collect_garbage(
+            dry_run=not args.apply,
+            grace_hours=args.grace_hours,
+            batch_size=args.batch_size,
+            pause=args.pause,
+            max_deletes=args.max_deletes
+        ))
+    except Exception as e:
+        logger.exception(f"Erro na coleta de uploads: {e}")
+        sys.exit(1)
@@ -0,0 +1,41 @@
+import os
+import threading
+
+
+class ProcessThread:
+    """Thread daemon de um serviço, iniciada no primeiro uso em cada processo.
+
+    Os serviços (view_counter, degraded_mode, related_posts) são criados no
+    import do app, antes do fork dos workers do Gunicorn, e threads não
+    sobrevivem ao fork: ensure_started() compara os.getpid() e inicia a thread
+    de novo no processo filho. on_start descarta o estado herdado do pai.
+    """
+
+    def __init__(self, name, target, on_start=None):
+        self.name = name
+        self.target = target
+        self.on_start = on_start
+        self.stop_event = threading.Event()
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def started(self):
+        """A thread está rodando neste processo?"""
+        return self._pid == os.getpid()
+
+    def ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self.stop_event = threading.Event()
+            if self.on_start:
+                self.on_start()
+            thread = threading.Thread(target=self.target, name=self.name, daemon=True)
+            thread.start()
+            self._pid = os.getpid()
+
+    def stop(self):
+        self.stop_event.set()
@@ -0,0 +1,10 @@
+def upsert_insert(db, table):
+    """insert() do dialeto do banco, com on_conflict_do_update (PostgreSQL e SQLite)"""
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise RuntimeError(f'UPSERT não suportado para {dialect}')
+    return insert(table)
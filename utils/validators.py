@@ -12,10 +12,10 @@ def validate_phone(phone):
     return len(phone) >= 10 and len(phone) <= 11
 
 def validate_url(url):
-    """Validação de URL"""
+    """Validação de URL (só http/https: javascript:, data: etc. não servem de link)"""
     try:
         result = urlparse(url)
-        return all([result.scheme, result.netloc])
+        return result.scheme in ('http', 'https') and bool(result.netloc)
     except Exception:
         return False
 
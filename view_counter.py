@@ -0,0 +1,141 @@
+"""
+Contador de visualizações dos posts com agregação em memória
+
+Cada worker acumula os incrementos em um Counter e uma thread em background
+grava tudo a cada VIEW_COUNTER_FLUSH_INTERVAL segundos com um único UPSERT
+multi-linha. Na saída do processo o que estiver pendente é gravado; em um
+crash perde-se no máximo um intervalo. A cada intervalo a lista dos mais
+lidos também é recalculada, mesmo em workers sem leituras pendentes (assim
+todos refletem as gravações dos outros), e as páginas só consultam a lista
+já pronta.
+"""
+
+import atexit
+import threading
+from collections import Counter
+
+from logging_setup import get_logger
+from utils.background import ProcessThread
+from utils.sql import upsert_insert
+
+logger = get_logger('view_counter')
+
+
+class ViewCounter:
+
+    def __init__(self):
+        self.app = None
+        self.flush_interval = 5
+        self.top_n = 5
+        self._pending = Counter()
+        self._top = []
+        self._lock = threading.Lock()
+        self._worker = ProcessThread('view-counter-flush', self._run, on_start=self._reset)
+
+    def init_app(self, app, db, model, post_model):
+        self.app = app
+        self.db = db
+        self.model = model
+        self.post_model = post_model
+        self.flush_interval = app.config.get('VIEW_COUNTER_FLUSH_INTERVAL', 5)
+        self.top_n = app.config.get('VIEW_COUNTER_TOP_N', 5)
+        atexit.register(self._shutdown)
+
+    def _reset(self):
+        # Incrementos herdados do processo pai pertencem a ele
+        self._pending = Counter()
+
+    def _run(self):
+        self.refresh_top()
+        while not self._worker.stop_event.wait(self.flush_interval):
+            self.flush()
+            self.refresh_top()
+
+    def _shutdown(self):
+        if self._worker.started:
+            self._worker.stop()
+            self.flush()
+
+    def increment(self, post_id, amount=1):
+        self._worker.ensure_started()
+        with self._lock:
+            self._pending[post_id] += amount
+
+    def _upsert(self, pending):
+        from sqlalchemy import func
+
+        table = self.model.__table__
+        stmt = upsert_insert(self.db, table).values([
+            {'post_id': post_id, 'total': total} for post_id, total in pending.items()
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.post_id],
+            set_={'total': table.c.total + stmt.excluded.total, 'updated_at': func.now()}
+        )
+        self.db.session.execute(stmt)
+        self.db.session.commit()
+
+    def flush(self):
+        """Grava os incrementos pendentes; em caso de falha eles voltam para a fila"""
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        if not pending:
+            return 0
+
+        with self.app.app_context():
+            try:
+                # Posts excluídos desde o incremento são descartados
+                existing = {
+                    post_id for (post_id,) in self.db.session.query(self.post_model.id)
+                    .filter(self.post_model.id.in_(list(pending)))
+                }
+                pending = Counter({post_id: n for post_id, n in pending.items() if post_id in existing})
+                if pending:
+                    self._upsert(pending)
+            except Exception as e:
+                self.db.session.rollback()
+                logger.warning(f"Erro ao gravar visualizações, tentando no próximo ciclo: {e}")
+                with self._lock:
+                    self._pending.update(pending)
+                return 0
+
+        return sum(pending.values())
+
+    def refresh_top(self):
+        """Recalcula a lista dos posts ativos mais lidos: [(post_id, total)]"""
+        with self.app.app_context():
+            try:
+                rows = (
+                    self.db.session.query(self.model.post_id, self.model.total)
+                    .join(self.post_model, self.post_model.id == self.model.post_id)
+                    .filter(self.post_model.ativo == True)
+                    .order_by(self.model.total.desc())
+                    .limit(self.top_n)
+                    .all()
+                )
+                self._top = [(post_id, total) for post_id, total in rows]
+            except Exception as e:
+                self.db.session.rollback()
+                logger.warning(f"Erro ao atualizar mais lidos: {e}")
+
+    def top(self):
+        """Mais lidos já calculados (não consulta o banco)"""
+        self._worker.ensure_started()
+        return list(self._top)
+
+    def counts(self, post_ids):
+        """Totais gravados + pendentes deste worker para os posts informados"""
+        post_ids = list(post_ids)
+        if not post_ids:
+            return {}
+        totals = dict(
+            self.db.session.query(self.model.post_id, self.model.total)
+            .filter(self.model.post_id.in_(post_ids))
+        )
+        with self._lock:
+            for post_id in post_ids:
+                totals[post_id] = totals.get(post_id, 0) + self._pending.get(post_id, 0)
+        return totals
+
+
+view_counter = ViewCounter()